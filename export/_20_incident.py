@@ -25,7 +25,7 @@ Program Description:
         d. Generates formatted Excel report
     - create_incident_table(): Handles Excel sheet creation with:
         a. Professional formatting and styling
-        b. Dynamic column sizing
+        b. Write-only (streamed) rows sized from the headers and leading data rows
         c. Filter headers display
         d. Empty dataset handling
 
@@ -39,7 +39,7 @@ Program Description:
 3. Key Features:
     - Parameter Validation:
         - Valid action_types: "collect arrears", "collect CPE", "collect arrears and CPE"
-        - Valid statuses: "Incident Open", "Incident close", "Incident reject"
+        - Valid statuses: "Incident Open", "Reject", "Complete", "Incident Error", "Incident Inprogress"
         - Date format enforcement (YYYY-MM-DD)
     - Error Handling:
         - Comprehensive validation errors
@@ -73,18 +73,16 @@ Technical Specifications:
 '''
 
 
-import logging
 from datetime import datetime, timedelta
-from bson import ObjectId
+from itertools import chain, islice
 from openpyxl import Workbook
-from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
-from pymongo import MongoClient
+from utils.style_loader import register_named_styles
+from utils.download_log import record_download
+from utils.excel_helpers import WIDTH_SAMPLE_ROWS, append_filter_row, append_header_row, append_main_header, column_widths, filename_timestamp, fit_column_widths, format_object_id, styled_cell
+from utils.fast_xlsx import FAST_WRITER_THRESHOLD, write_table_xlsx
 from utils.connectionMongo import MongoDBConnectionSingleton
-from utils.logger import SingletonLogger
 from logging import getLogger
-import platform
 from utils.config_loader import ConfigLoaderSingleton
 
 logger = getLogger('appLogger')
@@ -93,6 +91,64 @@ INCIDENT_HEADERS = [
     "Incident_Id", "Account_Num", "Incident_Status", "Actions",
     "Monitor_Months", "Created_By", "Created_Dtm", "Source_Type"
 ]
+_INCIDENT_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in INCIDENT_HEADERS)
+
+# Per-column value converters aligned with INCIDENT_HEADERS (None = written as-is)
+_INCIDENT_COL_FORMATTERS = [
+    format_object_id if header == "Incident_Id" else None
+    for header in INCIDENT_HEADERS
+]
+
+# Dates stay native datetimes so Excel can sort/filter them; Excel renders them with this format
+_DATETIME_NUMBER_FORMAT = 'yyyy-mm-dd hh:mm:ss'
+_INCIDENT_COL_NUMBER_FORMATS = [
+    _DATETIME_NUMBER_FORMAT if header == "Created_Dtm" else None
+    for header in INCIDENT_HEADERS
+]
+
+_INCIDENT_COLUMNS = tuple(zip(INCIDENT_HEADERS, _INCIDENT_COL_FORMATTERS))
+
+def _incident_row_values(record, _columns=_INCIDENT_COLUMNS):
+    """Pull the exported fields of one incident in header order, converted for the sheet"""
+    get = record.get
+    return [fmt(get(header, "")) if fmt is not None else get(header, "") for header, fmt in _columns]
+
+def _incident_filter_rows(filters):
+    """Active filters as (label, value) rows in display order; None when no filter block is shown"""
+    if not filters:
+        return None
+    filter_rows = []
+    if filters.get('action'):
+        filter_rows.append(("Action:", filters['action']))
+    if filters.get('status'):
+        filter_rows.append(("Status:", filters['status']))
+    if filters.get('date_range') and any(filters['date_range']):
+        start, end = filters['date_range']
+        date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
+        filter_rows.append(("Date Range:", date_str))
+    return filter_rows
+
+_VALID_ACTIONS = frozenset({"collect arrears and CPE", "collect arrears", "collect CPE"})
+_VALID_STATUSES = frozenset({"Incident Open", "Reject", "Complete", "Incident Error", "Incident Inprogress"})
+_END_OF_DAY = timedelta(days=1) - timedelta(seconds=1)
+
+# Fetch only the exported fields from Incident_log
+_INCIDENT_PROJECTION = {**{header: 1 for header in INCIDENT_HEADERS}, "_id": 0}
+
+# Equality fields first, then the Created_Dtm range
+INCIDENT_EXPORT_INDEX = "incident_export_idx"
+_INCIDENT_EXPORT_INDEX_KEYS = [("Incident_Status", 1), ("Actions", 1), ("Created_Dtm", 1)]
+
+def _parse_date(value):
+    """Parse a date as strptime('%Y-%m-%d') does; zero-padded YYYY-MM-DD strings take the faster fromisoformat"""
+    if len(value) == 10 and value[4] == '-' and value[7] == '-':
+        try:
+            return datetime.fromisoformat(value)
+        except ValueError:
+            pass
+    # Unpadded dates such as 2024-1-5, and strptime's own error message for invalid input
+    return datetime.strptime(value, '%Y-%m-%d')
+
 
 def excel_incident_detail(action_type, status, from_date, to_date):
 
@@ -101,49 +157,38 @@ def excel_incident_detail(action_type, status, from_date, to_date):
    
     try:   
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            export_dir = ConfigLoaderSingleton().get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            incident_log_collection = db["Incident_log"]
+            mongo = MongoDBConnectionSingleton()
+            incident_log_collection = mongo.get_collection("Incident_log")
+            if incident_log_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
+            index_ready = mongo.ensure_index("Incident_log", _INCIDENT_EXPORT_INDEX_KEYS, INCIDENT_EXPORT_INDEX, background=True)
             incident_query = {} 
 
             # Check each parameter and build query
             # Check action_type
             if action_type is not None:
-                if action_type == "collect arrears and CPE":
-                    incident_query["Actions"] = {"$regex": f"^{action_type}$"}
-                elif action_type == "collect arrears":
-                    incident_query["Actions"] = action_type
-                elif action_type == "collect CPE":
-                    incident_query["Actions"] = action_type
-                else:
+                if action_type not in _VALID_ACTIONS:
                     raise ValueError(f"Invalid action_type '{action_type}'. Must be 'collect arrears and CPE', 'collect arrears', or 'collect CPE'")
+                incident_query["Actions"] = action_type
             
 
             # Check status
             if status is not None:
-                if status == "Incident Open":
-                    incident_query["Incident_Status"] = {"$regex": f"^{status}$"}
-                elif status == "Reject":
-                    incident_query["Incident_Status"] = status
-                elif status == "Complete":
-                    incident_query["Incident_Status"] = status
-                elif status == "Incident Error":
-                    incident_query["Incident_Status"] = status
-                elif status == "Incident Inprogress":
-                    incident_query["Incident_Status"] = status
-                else:
-                    raise ValueError(f"Invalid status '{status}'. Must be 'Incident Open', 'Incident Close', or 'Incident Reject'")
+                if status not in _VALID_STATUSES:
+                    raise ValueError(f"Invalid status '{status}'. Must be 'Incident Open', 'Reject', 'Complete', 'Incident Error', or 'Incident Inprogress'")
+                incident_query["Incident_Status"] = status
 
 
 
             # Check date range
+            from_dt = to_dt = None
             if from_date is not None and to_date is not None:
                 try:
                     # Check if from_date and to_date are in correct YYYY-MM-DD format
-                    from_dt = datetime.strptime(from_date, '%Y-%m-%d')
-                    to_dt = datetime.strptime(to_date, '%Y-%m-%d') + timedelta(days=1) - timedelta(seconds=1)
+                    from_dt = _parse_date(from_date)
+                    to_dt = _parse_date(to_date) + _END_OF_DAY
                     
                     # Validate date range
                     if to_dt < from_dt:
@@ -159,51 +204,59 @@ def excel_incident_detail(action_type, status, from_date, to_date):
             
             # Log and execute query
             logger.info(f"Executing query: {incident_query}")
-            incidents = list(incident_log_collection.find(incident_query))  # Fetch data into an array
-            logger.info(f"Found {len(incidents)} matching incidents")
+            incidents = incident_log_collection.find(incident_query, _INCIDENT_PROJECTION).batch_size(1000)  # Streamed into the sheet
+            if index_ready and all(field in incident_query for field, _ in _INCIDENT_EXPORT_INDEX_KEYS):
+                incidents = incidents.hint(INCIDENT_EXPORT_INDEX)
 
             # Export to Excel even if no incidents are found
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
+            now_dt = datetime.now()
+            timestamp = filename_timestamp(now_dt)
             filename = f"incidents_details_{timestamp}.xlsx"
             filepath = export_dir / filename
 
-            wb = Workbook()
-            wb.remove(wb.active)
-
-            if not create_incident_table(wb, incidents, {
+            filters = {
                 "action": action_type,
                 "status": status,
-                "date_range": (from_dt if from_date is not None else None, to_dt if to_date is not None else None)
-            }):
-                raise Exception("Failed to create incident sheet")
-
-            wb.save(filepath)
-
-            # Write export record to Download collection
-            try:
-                download_collection = db["file_download_log"]
-                export_record = {
-                    "File_Name": filename,
-                    "File_Path": str(filepath),
-                    "Export_Timestamp": datetime.now(),
-                    "Exported_Record_Count": len(incidents),
-                    "Applied_Filters": {
-                        "Action": action_type,
-                        "Status": status,
-                        "From_Date": from_date,
-                        "To_Date": to_date
-                    }
+                "date_range": (from_dt, to_dt)
+            }
+
+            # Look ahead just past the threshold to choose the writer without counting the cursor
+            records = iter(incidents)
+            head = list(islice(records, FAST_WRITER_THRESHOLD + 1))
+            if len(head) > FAST_WRITER_THRESHOLD:
+                exported_count = write_incident_fast_table(filepath, chain(head, records), filters)
+                if exported_count is None:
+                    raise Exception("Failed to write incident sheet")
+            else:
+                wb = Workbook(write_only=True)
+                register_named_styles(wb)
+
+                exported_count = create_incident_table(wb, head, filters)
+                if exported_count is None:
+                    raise Exception("Failed to create incident sheet")
+
+                wb.save(filepath)
+            logger.info(f"Found {exported_count} matching incidents")
+
+            # Queue export record for the Download collection; written by the background log worker
+            record_download({
+                "File_Name": filename,
+                "File_Path": str(filepath),
+                "Export_Timestamp": now_dt,
+                "Exported_Record_Count": exported_count,
+                "Applied_Filters": {
+                    "Action": action_type,
+                    "Status": status,
+                    "From_Date": from_date,
+                    "To_Date": to_date
                 }
-                download_collection.insert_one(export_record)
-                logger.info("Export details written to Download collection.")
-            except Exception as e:
-                logger.error(f"Failed to insert download record: {str(e)}", exc_info=True)
+            })
 
 
-            if not incidents:
-                print("No incidents found matching the selected filters. Exported empty table to: {filepath}")
+            if not exported_count:
+                print(f"No incidents found matching the selected filters. Exported empty table to: {filepath}")
             else:
-                print(f"\nSuccessfully exported {len(incidents)} records to: {filepath}")
+                print(f"\nSuccessfully exported {exported_count} records to: {filepath}")
             return True
 
     except ValueError as ve:
@@ -220,92 +273,70 @@ def create_incident_table(wb, data, filters=None):
     """Create formatted Excel sheet with filtered incident data, including headers even if no data"""
     try:
         ws = wb.create_sheet(title="INCIDENT REPORT")
+
+        # Column widths are written ahead of the rows in write-only mode, so size them
+        # from the headers and a buffered head of the data in one pass
+        records = iter(data)
+        head = [_incident_row_values(record) for record in islice(records, WIDTH_SAMPLE_ROWS)]
+        fit_column_widths(ws, _INCIDENT_HEADER_TITLES, head)
+
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(INCIDENT_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="INCIDENT REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        append_main_header(ws, row_idx, "INCIDENT REPORT", len(INCIDENT_HEADERS))
         row_idx += 1
         
         # Display Active Filters
-        if filters:
+        filter_rows = _incident_filter_rows(filters)
+        if filter_rows is not None:
+            ws.append([])
             row_idx += 1
             
-            if filters.get('action'):
-                ws.cell(row=row_idx, column=2, value="Action:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['action']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            if filters.get('status'):
-                ws.cell(row=row_idx, column=2, value="Status:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['status']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            if filters.get('date_range') and any(filters['date_range']):
-                start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+            for label, value in filter_rows:
+                append_filter_row(ws, label, value)
                 row_idx += 1
             
+            ws.append([])
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(INCIDENT_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        append_header_row(ws, _INCIDENT_HEADER_TITLES)
         
         # Data Rows (only if data exists)
-        if data:
-            for record in data:
-                row_idx += 1
-                for col_idx, header in enumerate(INCIDENT_HEADERS, 1):
-                    value = record.get(header, "")
-                    if header == "Incident_Id" and isinstance(value, ObjectId):
-                        value = str(value)
-                    if header == "Created_Dtm" and isinstance(value, datetime):
-                        value = value.strftime('%Y-%m-%d %H:%M:%S')
-                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                    cell.font = STYLES['Border_Style']['font']
-                    cell.border = STYLES['Border_Style']['border']
-                    cell.alignment = STYLES['Border_Style']['alignment']
+        row_count = 0
+        for values in chain(head, map(_incident_row_values, records)):
+            ws.append([styled_cell(ws, value, 'Border_Style', number_format)
+                       for value, number_format in zip(values, _INCIDENT_COL_NUMBER_FORMATS)])
+            row_count += 1
         
         # Add AutoFilter to headers
         last_col_letter = get_column_letter(len(INCIDENT_HEADERS))
         ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{header_row}"
         
-        # Auto-adjust columns based on headers (and data if present)
-        for col_idx in range(1, len(INCIDENT_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = max(adjusted_width, 20)
-        
-        return True
+        return row_count
     
     except Exception as e:
         logger.error(f"Error creating sheet: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+        return None
+
+
+def write_incident_fast_table(filepath, data, filters=None):
+    """Write the incident report straight to sheet XML for exports above FAST_WRITER_THRESHOLD rows,
+    with the same layout and styles as create_incident_table"""
+    try:
+        rows = map(_incident_row_values, data)
+        head = list(islice(rows, WIDTH_SAMPLE_ROWS))
+
+        # Filter block is framed by blank rows, as in create_incident_table
+        filter_rows = _incident_filter_rows(filters)
+        return write_table_xlsx(
+            filepath, "INCIDENT REPORT", "INCIDENT REPORT", _INCIDENT_HEADER_TITLES, chain(head, rows),
+            filter_rows=[None, *filter_rows, None] if filter_rows is not None else [],
+            widths=column_widths(_INCIDENT_HEADER_TITLES, head),
+            number_formats=_INCIDENT_COL_NUMBER_FORMATS
+        )
+
+    except Exception as e:
+        logger.error(f"Error writing sheet: {str(e)}", exc_info=True)
+        return None
@@ -1,12 +1,12 @@
-import logging
-from datetime import datetime, timedelta
-from bson import ObjectId
+from datetime import datetime
+from itertools import chain, islice
 from openpyxl import Workbook
-from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
+from utils.style_loader import register_named_styles
+from utils.download_log import record_download
+from utils.excel_helpers import WIDTH_SAMPLE_ROWS, append_header_row, append_main_header, column_widths, filename_timestamp, fit_column_widths, format_object_id, styled_cell
+from utils.fast_xlsx import FAST_WRITER_THRESHOLD, write_table_xlsx
 from logging import getLogger
-from pymongo import MongoClient
 from utils.connectionMongo import MongoDBConnectionSingleton
 from utils.config_loader import ConfigLoaderSingleton
 
@@ -17,59 +17,79 @@ INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS = [
     "Id", "Incident_Status", "Account_Num", "Actions",
     "Amount", "Source_Type"
 ]
+_INCIDENT_OPEN_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS)
+
+# Per-column value converters aligned with INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS (None = written as-is)
+_INCIDENT_OPEN_COL_FORMATTERS = [
+    format_object_id if header == "Id" else None
+    for header in INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS
+]
+
+_INCIDENT_OPEN_COLUMNS = tuple(zip(INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS, _INCIDENT_OPEN_COL_FORMATTERS))
+
+def _incident_open_row_values(record, _columns=_INCIDENT_OPEN_COLUMNS):
+    """Pull the exported fields of one open incident in header order, converted for the sheet"""
+    get = record.get
+    return [fmt(get(header, "")) if fmt is not None else get(header, "") for header, fmt in _columns]
+
+# Fetch only the exported fields from Incident_log
+_INCIDENT_OPEN_PROJECTION = {**{header: 1 for header in INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS}, "_id": 0}
 
 def excel_incident_open_distribution():
     """Fetch and export all open incidents for distribution without parameter filtering"""
     
     try:
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            export_dir = ConfigLoaderSingleton().get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            incident_log_collection = db["Incident_log"]
+            incident_log_collection = MongoDBConnectionSingleton().get_collection("Incident_log")
+            if incident_log_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
             
             incident_open_query = {"Incident_Status": "Incident Open"}  # Fixed filter for open incidents
 
             # Log and execute query
             logger.info(f"Executing query: {incident_open_query}")
-            incidents = list(incident_log_collection.find(incident_open_query))
-            logger.info(f"Found {len(incidents)} matching incidents")
+            incidents = incident_log_collection.find(incident_open_query, _INCIDENT_OPEN_PROJECTION).batch_size(1000)
 
             # Export to Excel even if no open incidents are found
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
+            now_dt = datetime.now()
+            timestamp = filename_timestamp(now_dt)
             filename = f"incident_open_distribution_{timestamp}.xlsx"
             filepath = export_dir / filename
          
 
-            wb = Workbook()
-            wb.remove(wb.active)
+            # Look ahead just past the threshold to choose the writer without counting the cursor
+            records = iter(incidents)
+            head = list(islice(records, FAST_WRITER_THRESHOLD + 1))
+            if len(head) > FAST_WRITER_THRESHOLD:
+                exported_count = write_incident_open_distribution_fast_table(filepath, chain(head, records))
+                if exported_count is None:
+                    raise Exception("Failed to write incident open distribution sheet")
+            else:
+                wb = Workbook(write_only=True)
+                register_named_styles(wb)
 
-            if not create_incident_open_distribution_table(wb, incidents):
-                raise Exception("Failed to create incident open distribution sheet")
+                exported_count = create_incident_open_distribution_table(wb, head)
+                if exported_count is None:
+                    raise Exception("Failed to create incident open distribution sheet")
 
-            wb.save(filepath)
+                wb.save(filepath)
+            logger.info(f"Found {exported_count} matching incidents")
 
-            # Write export record to Download collection
-            try:
-                download_collection = db["file_download_log"]
-                export_record = {
-                    "File_Name": filename,
-                    "File_Path": str(filepath),
-                    "Export_Timestamp": datetime.now(),
-                    "Exported_Record_Count": len(incidents)
-                }
-                
-                download_collection.insert_one(export_record)
-                logger.info("Export details written to Download collection.")
-            except Exception as e:
-                logger.error(f"Failed to insert download record: {str(e)}", exc_info=True)
+            # Queue export record for the Download collection; written by the background log worker
+            record_download({
+                "File_Name": filename,
+                "File_Path": str(filepath),
+                "Export_Timestamp": now_dt,
+                "Exported_Record_Count": exported_count
+            })
 
 
-            if not incidents:
+            if not exported_count:
                 print(f"No open incidents found. Exported empty table to: {filepath}")
             else:
-                print(f"\nSuccessfully exported {len(incidents)} records to: {filepath}")
+                print(f"\nSuccessfully exported {exported_count} records to: {filepath}")
             return True
 
     except Exception as e:
@@ -82,55 +102,54 @@ def create_incident_open_distribution_table(wb, data):
     """Create formatted Excel sheet with open incident distribution data, including headers even if no data"""
     try:
         ws = wb.create_sheet(title="OPEN INCIDENT DISTRIBUTION")
+
+        # Column widths are written ahead of the rows in write-only mode, so size them
+        # from the headers and a buffered head of the data in one pass
+        records = iter(data)
+        head = [_incident_open_row_values(record) for record in islice(records, WIDTH_SAMPLE_ROWS)]
+        fit_column_widths(ws, _INCIDENT_OPEN_HEADER_TITLES, head)
+
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="OPEN INCIDENT DISTRIBUTION REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        append_main_header(ws, row_idx, "OPEN INCIDENT DISTRIBUTION REPORT", len(INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS))
+        ws.append([])
         row_idx += 2
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        append_header_row(ws, _INCIDENT_OPEN_HEADER_TITLES)
         
         # Data Rows (only if data exists)
-        if data:
-            for record in data:
-                row_idx += 1
-                for col_idx, header in enumerate(INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS, 1):
-                    value = record.get(header, "")
-                    if header == "Id" and isinstance(value, ObjectId):
-                        value = str(value)
-                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                    cell.font = STYLES['Border_Style']['font']
-                    cell.border = STYLES['Border_Style']['border']
-                    cell.alignment = STYLES['Border_Style']['alignment']
+        row_count = 0
+        for values in chain(head, map(_incident_open_row_values, records)):
+            ws.append([styled_cell(ws, value, 'Border_Style') for value in values])
+            row_count += 1
         
         # Add AutoFilter to headers
         last_col_letter = get_column_letter(len(INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS))
         ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{header_row}"
         
-        # Auto-adjust columns based on headers (and data if present)
-        for col_idx in range(1, len(INCIDENT_OPEN_FOR_DISTRIBUTION_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = max(adjusted_width, 20)
-        
-        return True
+        return row_count
     
     except Exception as e:
         logger.error(f"Error creating sheet: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+        return None
+
+
+def write_incident_open_distribution_fast_table(filepath, data):
+    """Write the open incident distribution report straight to sheet XML for exports above FAST_WRITER_THRESHOLD rows,
+    with the same layout and styles as create_incident_open_distribution_table"""
+    try:
+        rows = map(_incident_open_row_values, data)
+        head = list(islice(rows, WIDTH_SAMPLE_ROWS))
+        return write_table_xlsx(
+            filepath, "OPEN INCIDENT DISTRIBUTION", "OPEN INCIDENT DISTRIBUTION REPORT",
+            _INCIDENT_OPEN_HEADER_TITLES, chain(head, rows),
+            filter_rows=[None],  # Blank row under the main header
+            widths=column_widths(_INCIDENT_OPEN_HEADER_TITLES, head)
+        )
+
+    except Exception as e:
+        logger.error(f"Error writing sheet: {str(e)}", exc_info=True)
+        return None
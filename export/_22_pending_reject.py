@@ -88,6 +88,7 @@ from openpyxl import Workbook
 from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
 from utils.style_loader import STYLES
+from utils.excel_helpers import write_filter_row, write_header_row, write_main_header
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -104,11 +105,12 @@ def excel_pending_reject_incident(drc_commission_rules, from_date, to_date):
     
     try:
             #Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            export_dir = ConfigLoaderSingleton().get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            incident_log_collection = db["Incident"]
+            mongo = MongoDBConnectionSingleton()
+            incident_log_collection = mongo.get_collection("Incident")
+            if incident_log_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
 
             pending_reject_query = {"Incident_Status": {"$in": [ "Pending Reject"]}}
 
@@ -159,7 +161,7 @@ def excel_pending_reject_incident(drc_commission_rules, from_date, to_date):
 
              # Write export record to Download collection
             try:
-                download_collection = db["file_download_log"]
+                download_collection = mongo.get_collection("file_download_log")
                 export_record = {
                     "File_Name": filename,
                     "File_Path": str(filepath),
@@ -199,11 +201,7 @@ def create_pending_reject_incident_table(wb, data, filters=None):
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(PENDING_REJECT_INCIDENT_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="PENDING REJECT INCIDENT REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        write_main_header(ws, row_idx, "PENDING REJECT INCIDENT REPORT", len(PENDING_REJECT_INCIDENT_HEADERS))
         row_idx += 1
         
         # Display Active Filters
@@ -211,36 +209,20 @@ def create_pending_reject_incident_table(wb, data, filters=None):
             row_idx += 1
             
             if filters.get('drc_commission_rules'):
-                ws.cell(row=row_idx, column=2, value="DRC Commission Rules:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=", ".join(filters['drc_commission_rules'])).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+                write_filter_row(ws, row_idx, "DRC Commission Rules:", ", ".join(filters['drc_commission_rules']))
                 row_idx += 1
             
             if filters.get('date_range') and any(filters['date_range']):
                 start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
                 date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+                write_filter_row(ws, row_idx, "Date Range:", date_str)
                 row_idx += 1
             
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(PENDING_REJECT_INCIDENT_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        write_header_row(ws, row_idx, [header.replace('_', ' ').title() for header in PENDING_REJECT_INCIDENT_HEADERS], width=20)
         
         # Data Rows (only if data exists)
         if data:
@@ -23,7 +23,7 @@ Program Description:
         d. Generates formatted Excel report
     - create_direct_lod_table(): Handles Excel sheet creation with:
         a. Professional formatting and styling
-        b. Dynamic column sizing
+        b. Write-only (streamed) rows sized from the headers and leading data rows
         c. Filter headers display
         d. Empty dataset handling
 
@@ -71,11 +71,13 @@ Technical Specifications:
 '''
 
 from datetime import datetime, timedelta
-from bson import ObjectId
+from itertools import chain, islice
+from operator import itemgetter
 from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
+from utils.style_loader import register_named_styles
+from utils.download_log import record_download
+from utils.excel_helpers import COLUMN_LETTERS, WIDTH_SAMPLE_ROWS, append_filter_row, append_header_row, append_main_header, column_widths, filename_timestamp, fit_column_widths, format_object_id, styled_cell_factory
+from utils.fast_xlsx import FAST_WRITER_THRESHOLD, write_table_xlsx
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -86,6 +88,54 @@ DIRECT_LOD_HEADERS = [
     "Incident_Id", "Incident_Status", "Account_Num", "Amount",
     "Source_Type"
 ]
+_DIRECT_LOD_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in DIRECT_LOD_HEADERS)
+_DIRECT_LOD_LAST_COLUMN = COLUMN_LETTERS[len(DIRECT_LOD_HEADERS) - 1]
+
+# Fetch only the exported fields from Incident (Incident_Id is a stored field, not _id)
+_DIRECT_LOD_PROJECTION = {**{header: 1 for header in DIRECT_LOD_HEADERS}, "_id": 0}
+
+# Projected documents are a few hundred bytes, so large batches stay far below the 16 MB reply cap
+_DIRECT_LOD_BATCH_SIZE = 5000
+
+# Equality on Incident_Status first, then the Created_Dtm range
+DIRECT_LOD_EXPORT_INDEX = "direct_lod_export_idx"
+_DIRECT_LOD_EXPORT_INDEX_KEYS = [("Incident_Status", 1), ("Created_Dtm", 1)]
+
+# Per-column value converters aligned with DIRECT_LOD_HEADERS (None = written as-is)
+_DIRECT_LOD_COL_FORMATTERS = [
+    format_object_id if header == "Incident_Id" else None
+    for header in DIRECT_LOD_HEADERS
+]
+
+# All exported fields in one C-level call; raises KeyError when a document lacks one of them
+_DIRECT_LOD_FIELDS = itemgetter(*DIRECT_LOD_HEADERS)
+
+def _direct_lod_row_values(record, _fields=_DIRECT_LOD_FIELDS, _headers=tuple(DIRECT_LOD_HEADERS), _formatters=tuple(_DIRECT_LOD_COL_FORMATTERS)):
+    """Pull the exported fields of one Direct LOD incident in header order, converted for the sheet"""
+    try:
+        values = _fields(record)
+    except KeyError:
+        # Missing fields are written as ""
+        get = record.get
+        values = [get(header, "") for header in _headers]
+    return [fmt(value) if fmt is not None else value for value, fmt in zip(values, _formatters)]
+
+def _direct_lod_filter_rows(filters):
+    """Active filters as (label, value) rows in display order; None when no filter block is shown"""
+    if not filters:
+        return None
+    filter_rows = []
+    if filters.get('task_id'):
+        filter_rows.append(("Task ID:", filters['task_id']))
+    # Incident Status is always shown ("Direct LOD")
+    filter_rows.append(("Incident Status:", filters['incident_status']))
+    if filters.get('drc_commision_rule'):
+        filter_rows.append(("DRC Commission Rule:", filters['drc_commision_rule']))
+    if filters.get('date_range') and any(filters['date_range']):
+        start, end = filters['date_range']
+        date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
+        filter_rows.append(("Date Range:", date_str))
+    return filter_rows
 
 
 def excel_direct_lod_detail(from_date, to_date, drc_commision_rule):
@@ -94,14 +144,17 @@ def excel_direct_lod_detail(from_date, to_date, drc_commision_rule):
    
     try:
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            export_dir = ConfigLoaderSingleton().get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            incident_collection = db["Incident"]
+            mongo = MongoDBConnectionSingleton()
+            incident_collection = mongo.get_collection("Incident")
+            if incident_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
+            index_ready = mongo.ensure_index("Incident", _DIRECT_LOD_EXPORT_INDEX_KEYS, DIRECT_LOD_EXPORT_INDEX, background=True)
             direct_lod_query = {"Incident_Status": "Direct LOD"}
 
-            # Apply date range filter
+            # Apply date range filter; the parsed dates are reused for the filter block
+            from_dt = to_dt = None
             if from_date is not None and to_date is not None:
                 try:
                     # Check if from_date and to_date are in correct YYYY-MM-DD format
@@ -123,61 +176,67 @@ def excel_direct_lod_detail(from_date, to_date, drc_commision_rule):
 
             # Validate and apply drc_commision_rule filter
             if drc_commision_rule is not None:
-                if drc_commision_rule == "PEO TV":
-                    direct_lod_query["drc_commision_rule"] = {"$regex": f"^{drc_commision_rule}$"}
-                elif drc_commision_rule == "BB":
+                if drc_commision_rule in ("PEO TV", "BB"):
                     direct_lod_query["drc_commision_rule"] = drc_commision_rule
                 else:
                     raise ValueError(f"Invalid drc_commision_rule '{drc_commision_rule}'. Must be 'PEO TV', 'BB'")
             
                 
             logger.info(f"Executing query on Incident for direct LOD : {direct_lod_query}")
-            incidents = list(incident_collection.find(direct_lod_query))
-            logger.info(f"Found {len(incidents)} matching direct LOD incident")
+            incidents = incident_collection.find(direct_lod_query, _DIRECT_LOD_PROJECTION).batch_size(_DIRECT_LOD_BATCH_SIZE)  # Streamed into the sheet
+            if index_ready:
+                # Incident_Status is always filtered, so the index prefix applies; no sort, rows stream in index order
+                incidents = incidents.hint(DIRECT_LOD_EXPORT_INDEX)
 
             # Export to Excel
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
+            now_dt = datetime.now()
+            timestamp = filename_timestamp(now_dt)
             filename = f"direct_lod_incidents_task_{timestamp}.xlsx"
             filepath = export_dir / filename
 
-            wb = Workbook()
-            wb.remove(wb.active)
-
-            if not create_direct_lod_table(wb, incidents, {
+            filters = {
                 "incident_status": "Direct LOD",
                 "drc_commision_rule": drc_commision_rule,
-                "date_range": (datetime.strptime(from_date, '%Y-%m-%d') if from_date else None,
-                            datetime.strptime(to_date, '%Y-%m-%d') if to_date else None)
-            }):
-                raise Exception(f"Failed to create direct LOD incident sheet")
-
-            wb.save(filepath)
-
-            # Write export record to Download collection
-            try:
-                download_collection = db["file_download_log"]
-                export_record = {
-                    "File_Name": filename,
-                    "File_Path": str(filepath),
-                    "Export_Timestamp": datetime.now(),
-                    "Exported_Record_Count": len(incidents),
-                    "Applied_Filters": {
-                        "From_Date": from_date,
-                        "To_Date": to_date,
-                        "DRC_Commsion_Rule": drc_commision_rule
-                    }
+                "date_range": (from_dt, to_dt)
+            }
+
+            # Look ahead just past the threshold to choose the writer without counting the cursor
+            records = iter(incidents)
+            head = list(islice(records, FAST_WRITER_THRESHOLD + 1))
+            if len(head) > FAST_WRITER_THRESHOLD:
+                exported_count = write_direct_lod_fast_table(filepath, chain(head, records), filters)
+                if exported_count is None:
+                    raise Exception("Failed to write direct LOD incident sheet")
+            else:
+                wb = Workbook(write_only=True)
+                register_named_styles(wb)
+
+                exported_count = create_direct_lod_table(wb, head, filters)
+                if exported_count is None:
+                    raise Exception(f"Failed to create direct LOD incident sheet")
+
+                wb.save(filepath)
+            logger.info(f"Found {exported_count} matching direct LOD incident")
+
+            # Queue export record for the Download collection; written by the background log worker
+            record_download({
+                "File_Name": filename,
+                "File_Path": str(filepath),
+                "Export_Timestamp": now_dt,
+                "Exported_Record_Count": exported_count,
+                "Applied_Filters": {
+                    "From_Date": from_date,
+                    "To_Date": to_date,
+                    "DRC_Commsion_Rule": drc_commision_rule
                 }
-                download_collection.insert_one(export_record)
-                logger.info("Export details written to Download collection.")
-            except Exception as e:
-                logger.error(f"Failed to insert download record: {str(e)}", exc_info=True)
+            })
 
 
-            if not incidents:
+            if not exported_count:
                 print(f"No direct LOD incidents found for selected filters. Exported empty table to: {filepath}")
             else:
-                print(f"\nSuccessfully exported {len(incidents)} direct LOD records to: {filepath}")
-            return False
+                print(f"\nSuccessfully exported {exported_count} direct LOD records to: {filepath}")
+            return True
 
     except ValueError as ve:
         logger.error(f"Validation error: {str(ve)}")
@@ -194,104 +253,76 @@ def create_direct_lod_table(wb, data, filters=None):
     """Create formatted Excel sheet for Direct LOD incidents"""
     try:
         ws = wb.create_sheet(title="DIRECT LOD INCIDENTS REPORT")
+
+        # Column widths are written ahead of the rows in write-only mode, so size them
+        # from the headers and a buffered head of the data in one pass
+        records = iter(data)
+        head = [_direct_lod_row_values(record) for record in islice(records, WIDTH_SAMPLE_ROWS)]
+        fit_column_widths(ws, _DIRECT_LOD_HEADER_TITLES, head)
+
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(DIRECT_LOD_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="DIRECT LOD INCIDENTS REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        append_main_header(ws, row_idx, "DIRECT LOD INCIDENTS REPORT", len(DIRECT_LOD_HEADERS))
         row_idx += 1
         
         # Display Active Filters
-        if filters:
-            row_idx += 1
-            
-            # Task_Id filter
-            if filters.get('task_id'):
-                ws.cell(row=row_idx, column=2, value="Task ID:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['task_id']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            # Incident Status filter (always "Direct LOD")
-            ws.cell(row=row_idx, column=2, value="Incident Status:").font = STYLES['FilterParam_Style']['font']
-            ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-            ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-            ws.cell(row=row_idx, column=3, value=filters['incident_status']).font = STYLES['FilterValue_Style']['font']
-            ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-            ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+        filter_rows = _direct_lod_filter_rows(filters)
+        if filter_rows is not None:
+            ws.append([])
             row_idx += 1
             
-            # DRC Commission Rule filter
-            if filters.get('drc_commision_rule'):
-                ws.cell(row=row_idx, column=2, value="DRC Commission Rule:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['drc_commision_rule']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            # Date Range filter
-            if filters.get('date_range') and any(filters['date_range']):
-                start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+            for label, value in filter_rows:
+                append_filter_row(ws, label, value)
                 row_idx += 1
             
+            ws.append([])
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(DIRECT_LOD_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        append_header_row(ws, _DIRECT_LOD_HEADER_TITLES)
+        
+        # An empty head means the cursor is exhausted: header-only sheet, no autofilter
+        if not head:
+            return 0
         
-        # Data Rows
-        for record in data:
+        # Data Rows; the row style is resolved once, not per cell
+        border_cell = styled_cell_factory(ws, 'Border_Style')
+        append = ws.append
+        row_count = 0
+        for values in chain(head, map(_direct_lod_row_values, records)):
             row_idx += 1
-            for col_idx, header in enumerate(DIRECT_LOD_HEADERS, 1):
-                value = record.get(header, "")
-                if header == "Incident_Id" and isinstance(value, ObjectId):
-                    value = str(value)
-                if header == "Created_Dtm" and isinstance(value, datetime):
-                    value = value.strftime('%Y-%m-%d %H:%M:%S')
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = STYLES['Border_Style']['font']
-                cell.border = STYLES['Border_Style']['border']
-                cell.alignment = STYLES['Border_Style']['alignment']
+            row_count += 1
+            append([border_cell(value) for value in values])
         
         # Add AutoFilter to all columns
-        if data:
-            last_col_letter = get_column_letter(len(DIRECT_LOD_HEADERS))
-            ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{row_idx}"
+        if row_count:
+            ws.auto_filter.ref = f"A{header_row}:{_DIRECT_LOD_LAST_COLUMN}{row_idx}"
         
-        # Auto-adjust columns
-        for col_idx in range(1, len(DIRECT_LOD_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = adjusted_width
-        
-        return True
+        return row_count
     
     except Exception as e:
         logger.error(f"Error creating Direct LOD sheet: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+        return None
+
+
+def write_direct_lod_fast_table(filepath, data, filters=None):
+    """Write the Direct LOD report straight to sheet XML for exports above FAST_WRITER_THRESHOLD rows,
+    with the same layout and styles as create_direct_lod_table"""
+    try:
+        rows = map(_direct_lod_row_values, data)
+        head = list(islice(rows, WIDTH_SAMPLE_ROWS))
+
+        # Filter block is framed by blank rows, as in create_direct_lod_table
+        filter_rows = _direct_lod_filter_rows(filters)
+        return write_table_xlsx(
+            filepath, "DIRECT LOD INCIDENTS REPORT", "DIRECT LOD INCIDENTS REPORT", _DIRECT_LOD_HEADER_TITLES, chain(head, rows),
+            filter_rows=[None, *filter_rows, None] if filter_rows is not None else [],
+            widths=column_widths(_DIRECT_LOD_HEADER_TITLES, head),
+            autofilter_rows=True
+        )
+
+    except Exception as e:
+        logger.error(f"Error writing Direct LOD sheet: {str(e)}", exc_info=True)
+        return None
@@ -115,8 +115,8 @@ from datetime import datetime, timedelta
 from bson import ObjectId
 from openpyxl import Workbook
 from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
+from utils.style_loader import register_named_styles
+from utils.excel_helpers import COLUMN_LETTERS, write_filter_row
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -127,6 +127,7 @@ CPE_HEADERS = [
     "Incident_Id", "Incident_Status", "Account_Num", "Actions",
     "Created_Dtm"
 ]
+_CPE_LAST_COLUMN = COLUMN_LETTERS[len(CPE_HEADERS) - 1]
 
 def excel_cpe_detail(from_date, to_date, drc_commision_rule):
     """Fetch and export 'collect CPE' incidents from Incident collection"""
@@ -134,11 +135,12 @@ def excel_cpe_detail(from_date, to_date, drc_commision_rule):
 
     try:
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            export_dir = ConfigLoaderSingleton().get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            incident_log_collection = db["Incident_log"]
+            mongo = MongoDBConnectionSingleton()
+            incident_log_collection = mongo.get_collection("Incident_log")
+            if incident_log_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
             cpe_list_query = {"Actions": "collect CPE"}  # Fixed to only collect CPE
 
             
@@ -165,7 +167,7 @@ def excel_cpe_detail(from_date, to_date, drc_commision_rule):
             # Validate and apply drc_commision_rule filter
             if drc_commision_rule is not None:
                 if drc_commision_rule == "PEO TV":
-                    cpe_list_query["Drc commision rule"] = {"$regex": f"^{drc_commision_rule}$"}
+                    cpe_list_query["Drc commision rule"] = drc_commision_rule
                 elif drc_commision_rule == "BB":
                     cpe_list_query["Actions"] = drc_commision_rule   
                 else:
@@ -183,6 +185,7 @@ def excel_cpe_detail(from_date, to_date, drc_commision_rule):
 
             wb = Workbook()
             wb.remove(wb.active)
+            register_named_styles(wb)
 
             if not create_cpe_table(wb, incidents, {
                 "action": "collect CPE",
@@ -196,7 +199,7 @@ def excel_cpe_detail(from_date, to_date, drc_commision_rule):
 
             # Write export record to Download collection
             try:
-                download_collection = db["file_download_log"]
+                download_collection = mongo.get_collection("file_download_log")
                 export_record = {
                     "File_Name": filename,
                     "File_Path": str(filepath),
@@ -215,7 +218,7 @@ def excel_cpe_detail(from_date, to_date, drc_commision_rule):
 
 
             if not incidents:
-                print("No CPE incidents found matching the selected filters. Exported empty table to: {filepath}")
+                print(f"No CPE incidents found matching the selected filters. Exported empty table to: {filepath}")
             else:
                 print(f"\nSuccessfully exported {len(incidents)} CPE records to: {filepath}")
             return True
@@ -231,52 +234,41 @@ def excel_cpe_detail(from_date, to_date, drc_commision_rule):
     
 
 def create_cpe_table(wb, data, filters=None):
-    """Create formatted Excel sheet with CPE incident data"""
+    """Create formatted Excel sheet with CPE incident data; cells take the named styles from register_named_styles()"""
     try:
         ws = wb.create_sheet(title="CPE INCIDENT REPORT")
         row_idx = 1
         
         # Main Header
         ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(CPE_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="CPE INCIDENT REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        ws.cell(row=row_idx, column=1, value="CPE INCIDENT REPORT").style = 'MainHeader_Style'
         row_idx += 1
         
+        # Longest rendered value per column, tracked as cells are written so widths need no rescan
+        col_max = [0] * len(CPE_HEADERS)
+        col_max[0] = len("CPE INCIDENT REPORT")
+        
         # Display Active Filters
         if filters:
             row_idx += 1
             
             # Action filter (always "collect CPE")
-            ws.cell(row=row_idx, column=2, value="Action:").font = STYLES['FilterParam_Style']['font']
-            ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-            ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-            ws.cell(row=row_idx, column=3, value=filters['action']).font = STYLES['FilterValue_Style']['font']
-            ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-            ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-            row_idx += 1
+            filter_rows = [("Action:", filters['action'])]
             
             # DRC Commission Rule filter
             if filters.get('drc_commision_rule'):
-                ws.cell(row=row_idx, column=2, value="DRC Commission Rule:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['drc_commision_rule']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
+                filter_rows.append(("DRC Commission Rule:", filters['drc_commision_rule']))
             
             # Date Range filter
             if filters.get('date_range') and any(filters['date_range']):
                 start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
                 date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+                filter_rows.append(("Date Range:", date_str))
+            
+            for label, value in filter_rows:
+                write_filter_row(ws, row_idx, label, value)
+                col_max[1] = max(col_max[1], len(str(label)) if label else 0)
+                col_max[2] = max(col_max[2], len(str(value)) if value else 0)
                 row_idx += 1
             
             row_idx += 1
@@ -284,12 +276,9 @@ def create_cpe_table(wb, data, filters=None):
         # Data Table Headers
         header_row = row_idx
         for col_idx, header in enumerate(CPE_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+            title = header.replace('_', ' ').title()
+            ws.cell(row=row_idx, column=col_idx, value=title).style = 'SubHeader_Style'
+            col_max[col_idx - 1] = max(col_max[col_idx - 1], len(title))
         
         # Data Rows
         for record in data:
@@ -300,25 +289,19 @@ def create_cpe_table(wb, data, filters=None):
                     value = str(value)
                 if header == "Created_Dtm" and isinstance(value, datetime):
                     value = value.strftime('%Y-%m-%d %H:%M:%S')
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = STYLES['Border_Style']['font']
-                cell.border = STYLES['Border_Style']['border']
-                cell.alignment = STYLES['Border_Style']['alignment']
+                # One named-style assignment instead of separate font/border/alignment lookups
+                ws.cell(row=row_idx, column=col_idx, value=value).style = 'Border_Style'
+                length = len(str(value)) if value else 0
+                if length > col_max[col_idx - 1]:
+                    col_max[col_idx - 1] = length
         
         # Add AutoFilter to all columns
         if data:
-            last_col_letter = get_column_letter(len(CPE_HEADERS))
-            ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{row_idx}"
+            ws.auto_filter.ref = f"A{header_row}:{_CPE_LAST_COLUMN}{row_idx}"
         
-        # Auto-adjust columns
-        for col_idx in range(1, len(CPE_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = adjusted_width
+        # Auto-adjust columns from the tracked maxima
+        for letter, max_length in zip(COLUMN_LETTERS, col_max):
+            ws.column_dimensions[letter].width = (max_length + 2) * 1.2
         
         return True
     
@@ -85,11 +85,11 @@ Technical Specifications:
 '''
 
 from datetime import datetime, timedelta
-from bson import ObjectId
 from openpyxl import Workbook
 from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
 from utils.style_loader import STYLES
+from utils.excel_helpers import format_datetime, format_object_id, set_column_widths, write_filter_row, write_header_row, write_main_header
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -100,6 +100,19 @@ REJECTED_HEADERS = [
     "Incident_Id", "Incident_Status", "Account_Num", "Created_Dtm",
     "Filtered_Reason", "Rejected_Dtm","Rejected_By"
 ]
+_REJECTED_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in REJECTED_HEADERS)
+
+_REJECTED_FORMATTERS = {
+    "Incident_Id": format_object_id,
+    "Created_Dtm": format_datetime,
+}
+
+# (column index, field, converter or None) per column, built once instead of an enumerate() and
+# two header comparisons per row
+_REJECTED_COLUMNS = tuple(
+    (col_idx, header, _REJECTED_FORMATTERS.get(header))
+    for col_idx, header in enumerate(REJECTED_HEADERS, 1)
+)
 
 def excel_rejected_detail(drc_commision_rule, from_date,to_date):
     """Fetch and export rejected incidents from Incident collection"""
@@ -107,19 +120,18 @@ def excel_rejected_detail(drc_commision_rule, from_date,to_date):
         
     try:
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            export_dir = ConfigLoaderSingleton().get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            incident_collection = db["Incident"]
+            mongo = MongoDBConnectionSingleton()
+            incident_collection = mongo.get_collection("Incident")
+            if incident_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
             reject_query = {"Incident_Status": "Incident Reject"}  # Fixed to only rejected incidents
 
            
             # Validate and apply drc_commision_rule filter
             if drc_commision_rule is not None:
-                if drc_commision_rule == "PEO TV":
-                  reject_query["drc_commision_rule"] = {"$regex": f"^{drc_commision_rule}$"}
-                elif drc_commision_rule == "BB":
+                if drc_commision_rule in ("PEO TV", "BB"):
                   reject_query["drc_commision_rule"] = drc_commision_rule
                 else:
                      raise ValueError(f"Invalid drc commision rule '{drc_commision_rule}'. Must be 'PEO TV', 'BB'")
@@ -167,7 +179,7 @@ def excel_rejected_detail(drc_commision_rule, from_date,to_date):
 
              # Write export record to Download collection
             try:
-                download_collection = db["file_download_log"]
+                download_collection = mongo.get_collection("file_download_log")
                 export_record = {
                     "File_Name": filename,
                     "File_Path": str(filepath),
@@ -186,7 +198,7 @@ def excel_rejected_detail(drc_commision_rule, from_date,to_date):
 
 
             if not incidents:
-                print("No rejected incidents found matching the selected filters. Exported empty table to: {filepath}")
+                print(f"No rejected incidents found matching the selected filters. Exported empty table to: {filepath}")
             else:    
                 print(f"\nSuccessfully exported {len(incidents)} rejected records to: {filepath}")
             return True            
@@ -209,11 +221,7 @@ def create_rejected_table(wb, data, filters=None):
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(REJECTED_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="REJECTED INCIDENT REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        write_main_header(ws, row_idx, "REJECTED INCIDENT REPORT", len(REJECTED_HEADERS))
         row_idx += 1
         
         # Display Active Filters
@@ -222,57 +230,46 @@ def create_rejected_table(wb, data, filters=None):
             
             # Actions filter
             if filters.get('actions'):
-                ws.cell(row=row_idx, column=2, value="Actions:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['actions']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+                write_filter_row(ws, row_idx, "Actions:", filters['actions'])
                 row_idx += 1
             
             # DRC Commission Rule filter
             if filters.get('drc_commision_rule'):
-                ws.cell(row=row_idx, column=2, value="DRC Commission Rule:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['drc_commision_rule']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+                write_filter_row(ws, row_idx, "DRC Commission Rule:", filters['drc_commision_rule'])
                 row_idx += 1
             
             # Date Range filter
             if filters.get('date_range') and any(filters['date_range']):
                 start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
                 date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+                write_filter_row(ws, row_idx, "Date Range:", date_str)
                 row_idx += 1
             
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(REJECTED_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        write_header_row(ws, row_idx, _REJECTED_HEADER_TITLES)
+        
+        # Column widths are tracked while the rows are written instead of re-reading every cell afterwards;
+        # the filter block (columns B and C) counts too, the merged title does not
+        col_max = [len(title) for title in _REJECTED_HEADER_TITLES]
+        for row in ws.iter_rows(min_row=2, max_row=header_row - 1, min_col=2, max_col=3, values_only=True):
+            for col_idx, value in enumerate(row, 1):
+                length = len(str(value)) if value else 0
+                if length > col_max[col_idx]:
+                    col_max[col_idx] = length
         
         # Data Rows
         for record in data:
             row_idx += 1
-            for col_idx, header in enumerate(REJECTED_HEADERS, 1):
+            for col_idx, header, fmt in _REJECTED_COLUMNS:
                 value = record.get(header, "")
-                if header == "Incident_Id" and isinstance(value, ObjectId):
-                    value = str(value)
-                if header == "Created_Dtm" and isinstance(value, datetime):
-                    value = value.strftime('%Y-%m-%d %H:%M:%S')
+                if fmt is not None:
+                    value = fmt(value)
+                length = len(str(value)) if value else 0
+                if length > col_max[col_idx - 1]:
+                    col_max[col_idx - 1] = length
                 cell = ws.cell(row=row_idx, column=col_idx, value=value)
                 cell.font = STYLES['Border_Style']['font']
                 cell.border = STYLES['Border_Style']['border']
@@ -284,14 +281,7 @@ def create_rejected_table(wb, data, filters=None):
             ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{row_idx}"
         
         # Auto-adjust columns
-        for col_idx in range(1, len(REJECTED_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = adjusted_width
+        set_column_widths(ws, [(length + 2) * 1.2 for length in col_max])
         
         return True
     
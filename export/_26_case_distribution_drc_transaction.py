@@ -27,7 +27,7 @@ Program Description:
         d. Generates formatted Excel report
     - create_distribution_table(): Handles Excel sheet creation with:
         a. Professional formatting and styling
-        b. Dynamic column sizing
+        b. Write-only (streamed) rows sized from the headers and leading data rows
         c. Filter headers display
         d. Empty dataset handling
 
@@ -45,7 +45,7 @@ Program Description:
         - Date format enforcement (YYYY-MM-DD)
         - Date range validation (date_to cannot be earlier than date_from)
     - Data Formatting:
-        - Formats datetime objects for Created Dtm
+        - Formats datetime objects for Created Dtm in the aggregation ($dateToString)
         - Converts Case Count to integers
     - Error Handling:
         - Comprehensive validation errors
@@ -85,17 +85,21 @@ Technical Specifications:
     - Collections Accessed:
         - Case_Distribution_log (primary data source)
     - Query Logic:
-        - Case-sensitive regex matching for DRC rules
+        - Exact (case-sensitive) matching for DRC rules
         - Exact matching for arrears bands
         - Date range filtering on Created Dtm field
 '''
 
 from datetime import datetime, timedelta
+from itertools import chain, islice
+from operator import itemgetter
 from bson import ObjectId
 from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
+from utils.style_loader import register_named_styles
+from utils.download_log import record_download
+from utils.excel_helpers import COLUMN_LETTERS, WIDTH_SAMPLE_ROWS, append_filter_row, append_header_row, append_main_header, column_widths, filename_timestamp, fit_column_widths, styled_cell_factory
+from utils.fast_xlsx import FAST_WRITER_THRESHOLD, write_table_xlsx
+from utils.cursor_prefetch import prefetched
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -107,17 +111,77 @@ DISTRIBUTION_HEADERS = [
     "Action Type", "DRC Commission Rule", "Arrears Band", 
     "Case Count", "Approval"
 ]
+_DISTRIBUTION_LAST_COLUMN = COLUMN_LETTERS[len(DISTRIBUTION_HEADERS) - 1]
+
+# Final pipeline stage: only the exported fields of each distribution. Created Dtm is rendered as
+# 'YYYY-MM-DD HH:MM:SS' text on the server (UTC, as the driver decodes it), so no datetime objects are built
+_DISTRIBUTION_PROJECT_STAGE = {"$project": {
+    **{header: 1 for header in DISTRIBUTION_HEADERS},
+    "_id": 0,
+    "Created Dtm": {"$cond": [
+        {"$eq": [{"$type": "$Created Dtm"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d %H:%M:%S", "date": "$Created Dtm"}},
+        "$Created Dtm"
+    ]},
+}}
+
+# Projected documents are a few hundred bytes, so large batches stay far below the 16 MB reply cap
+_DISTRIBUTION_BATCH_SIZE = 5000
+
+# Equality on Arrears Band first, then the Created Dtm range
+DISTRIBUTION_EXPORT_INDEX = "case_distribution_export_idx"
+_DISTRIBUTION_EXPORT_INDEX_KEYS = [("Arrears Band", 1), ("Created Dtm", 1)]
+
+def _format_case_count(value):
+    return int(value) if isinstance(value, (int, float)) else value
+
+# Per-column value converters aligned with DISTRIBUTION_HEADERS (None = written as-is);
+# Created Dtm arrives already formatted from the pipeline
+_DISTRIBUTION_COL_FORMATTERS = [
+    _format_case_count if header == "Case Count" else None
+    for header in DISTRIBUTION_HEADERS
+]
+
+# All exported fields in one C-level call; raises KeyError when a document lacks one of them
+_DISTRIBUTION_FIELDS = itemgetter(*DISTRIBUTION_HEADERS)
+
+def _distribution_row_values(record, _fields=_DISTRIBUTION_FIELDS, _headers=tuple(DISTRIBUTION_HEADERS), _formatters=tuple(_DISTRIBUTION_COL_FORMATTERS)):
+    """Pull the exported fields of one distribution in header order, converted for the sheet"""
+    try:
+        values = _fields(record)
+    except KeyError:
+        # Missing fields are written as ""
+        get = record.get
+        values = [get(header, "") for header in _headers]
+    return [fmt(value) if fmt is not None else value for value, fmt in zip(values, _formatters)]
+
+def _distribution_filter_rows(filters):
+    """Active filters as (label, value) rows in display order; None when no filter block is shown"""
+    if not filters:
+        return None
+    filter_rows = []
+    if filters.get('arrears_band'):
+        filter_rows.append(("Arrears Band:", filters['arrears_band']))
+    if filters.get('drc_rule'):
+        filter_rows.append(("DRC Commission Rule:", filters['drc_rule']))
+    if filters.get('date_range') and any(filters['date_range']):
+        start, end = filters['date_range']
+        date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
+        filter_rows.append(("Date Range:", date_str))
+    return filter_rows
 
 def excel_case_distribution_detail(arrears_band, drc_commision_rule, from_date, to_date):
     """Fetch and export case distribution DRC transaction data based on validated parameters"""
    
     try:   
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            export_dir = ConfigLoaderSingleton().get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            case_distribution_collection = db["Case_distribution_drc_transactions"]
+            mongo = MongoDBConnectionSingleton()
+            case_distribution_collection = mongo.get_collection("Case_distribution_drc_transactions")
+            if case_distribution_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
+            index_ready = mongo.ensure_index("Case_distribution_drc_transactions", _DISTRIBUTION_EXPORT_INDEX_KEYS, DISTRIBUTION_EXPORT_INDEX, background=True)
             drc_transaction_query = {}
 
             # Check Arrears_band parameter
@@ -131,15 +195,14 @@ def excel_case_distribution_detail(arrears_band, drc_commision_rule, from_date,
 
             # Check drc_commision_rule parameter
             if drc_commision_rule is not None:
-                if drc_commision_rule == "PEO TV":
-                    drc_transaction_query["drc_commision_rule"] = {"$regex": f"^{drc_commision_rule}$"}
-                elif drc_commision_rule == "BB":
+                if drc_commision_rule in ("PEO TV", "BB"):
                     drc_transaction_query["drc_commision_rule"] = drc_commision_rule
                 else:
                     raise ValueError(f"Invalid drc_commision_rule '{drc_commision_rule}'. Must be 'PEO TV', 'BB'")
             
 
-            # Check date range
+            # Check date range; the parsed dates are reused for the filter block
+            from_dt = to_dt = None
             if from_date is not None and to_date is not None:
                 try:
                     # Check if dates are in correct YYYY-MM-DD format
@@ -158,53 +221,67 @@ def excel_case_distribution_detail(arrears_band, drc_commision_rule, from_date,
                         raise
                     raise ValueError(f"Invalid date format. Use 'YYYY-MM-DD'. Error: {str(ve)}")
 
+            # $match first so the index serves it, then trim and format each distribution on the server
+            pipeline = [{"$match": drc_transaction_query}, _DISTRIBUTION_PROJECT_STAGE]
+            aggregate_options = {"batchSize": _DISTRIBUTION_BATCH_SIZE, "allowDiskUse": True}
+            if index_ready and "Arrears Band" in drc_transaction_query:
+                # Only hint when the index prefix is filtered; otherwise the hint would force a full index scan
+                aggregate_options["hint"] = DISTRIBUTION_EXPORT_INDEX
+
             # Log and execute query
-            logger.info(f"Executing query: {drc_transaction_query}")
-            distributions = list(case_distribution_collection.find(drc_transaction_query))
-            logger.info(f"Found {len(distributions)} matching distributions")
+            logger.info(f"Executing pipeline: {pipeline}")
+            distributions = case_distribution_collection.aggregate(pipeline, **aggregate_options)  # Streamed into the sheet
 
             # Export to Excel even if no distributions are found
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
+            now_dt = datetime.now()
+            timestamp = filename_timestamp(now_dt)
             filename = f"case_distribution_details_{timestamp}.xlsx"
             filepath = export_dir / filename
 
-            wb = Workbook()
-            wb.remove(wb.active)
-
-            if not create_distribution_table(wb, distributions, {
+            filters = {
                 "arrears_band": arrears_band,
                 "drc_rule": drc_commision_rule,
-                "date_range": (from_dt if from_date is not None else None, to_dt if to_date is not None else None)
-            }):
-                raise Exception("Failed to create distribution sheet")
-
-            wb.save(filepath)
-
-             # Write export record to Download collection
-            try:
-                download_collection = db["file_download_log"]
-                export_record = {
-                    "File_Name": filename,
-                    "File_Path": str(filepath),
-                    "Export_Timestamp": datetime.now(),
-                    "Exported_Record_Count": len(distributions),
-                    "Applied_Filters": {
-                        "Arrears_Band": arrears_band,
-                        "DRC_commision_rule": drc_commision_rule,
-                        "From_Date": from_date,
-                        "To_Date": to_date
-                    }
+                "date_range": (from_dt, to_dt)
+            }
+
+            # Look ahead just past the threshold to choose the writer without counting the cursor; the cursor
+            # is read on a background thread from here on, so its round trips overlap with writing the sheet
+            records = prefetched(distributions)
+            head = list(islice(records, FAST_WRITER_THRESHOLD + 1))
+            if len(head) > FAST_WRITER_THRESHOLD:
+                exported_count = write_distribution_fast_table(filepath, chain(head, records), filters)
+                if exported_count is None:
+                    raise Exception("Failed to write distribution sheet")
+            else:
+                wb = Workbook(write_only=True)
+                register_named_styles(wb)
+
+                exported_count = create_distribution_table(wb, head, filters)
+                if exported_count is None:
+                    raise Exception("Failed to create distribution sheet")
+
+                wb.save(filepath)
+            logger.info(f"Found {exported_count} matching distributions")
+
+            # Queue export record for the Download collection; written by the background log worker
+            record_download({
+                "File_Name": filename,
+                "File_Path": str(filepath),
+                "Export_Timestamp": now_dt,
+                "Exported_Record_Count": exported_count,
+                "Applied_Filters": {
+                    "Arrears_Band": arrears_band,
+                    "DRC_commision_rule": drc_commision_rule,
+                    "From_Date": from_date,
+                    "To_Date": to_date
                 }
-                download_collection.insert_one(export_record)
-                logger.info("Export details written to Download collection.")
-            except Exception as e:
-                logger.error(f"Failed to insert download record: {str(e)}", exc_info=True)
+            })
 
 
-            if not distributions:
+            if not exported_count:
                 print(f"No distributions found matching the selected filters. Exported empty table to: {filepath}")
             else:
-                print(f"\nSuccessfully exported {len(distributions)} records to: {filepath}")
+                print(f"\nSuccessfully exported {exported_count} records to: {filepath}")
             return True
 
     except ValueError as ve:
@@ -221,95 +298,69 @@ def create_distribution_table(wb, data, filters=None):
     """Create formatted Excel sheet with filtered distribution data, including headers even if no data"""
     try:
         ws = wb.create_sheet(title="CASE DISTRIBUTION REPORT")
+
+        # Column widths are written ahead of the rows in write-only mode, so size them
+        # from the headers and a buffered head of the data in one pass
+        records = iter(data)
+        head = [_distribution_row_values(record) for record in islice(records, WIDTH_SAMPLE_ROWS)]
+        fit_column_widths(ws, DISTRIBUTION_HEADERS, head)
+
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(DISTRIBUTION_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="CASE DISTRIBUTION DRC TRANSACTION LIST")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        append_main_header(ws, row_idx, "CASE DISTRIBUTION DRC TRANSACTION LIST", len(DISTRIBUTION_HEADERS))
         row_idx += 1
         
         # Display Active Filters
-        if filters:
+        filter_rows = _distribution_filter_rows(filters)
+        if filter_rows is not None:
+            ws.append([])
             row_idx += 1
             
-            if filters.get('arrears_band'):
-                ws.cell(row=row_idx, column=2, value="Arrears Band:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['arrears_band']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            if filters.get('drc_rule'):
-                ws.cell(row=row_idx, column=2, value="DRC Commission Rule:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['drc_rule']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            if filters.get('date_range') and any(filters['date_range']):
-                start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+            for label, value in filter_rows:
+                append_filter_row(ws, label, value)
                 row_idx += 1
             
+            ws.append([])
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(DISTRIBUTION_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header)
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        append_header_row(ws, DISTRIBUTION_HEADERS)
         
-        # Data Rows (only if data exists)
-        if data:
-            for record in data:
-                row_idx += 1
-                for col_idx, header in enumerate(DISTRIBUTION_HEADERS, 1):
-                    value = record.get(header, "")
-                    # Handle date fields
-                    if header == "Created Dtm" and isinstance(value, datetime):
-                        value = value.strftime('%Y-%m-%d %H:%M:%S')
-                    # Format case count as integer
-                    if header == "Case Count" and isinstance(value, (int, float)):
-                        value = int(value)
-                    
-                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                    cell.font = STYLES['Border_Style']['font']
-                    cell.border = STYLES['Border_Style']['border']
-                    cell.alignment = STYLES['Border_Style']['alignment']
+        # Data Rows (only if data exists); the row style is resolved once, not per cell
+        border_cell = styled_cell_factory(ws, 'Border_Style')
+        append = ws.append
+        row_count = 0
+        for values in chain(head, map(_distribution_row_values, records)):
+            append([border_cell(value) for value in values])
+            row_count += 1
         
         # Add AutoFilter to headers
-        last_col_letter = get_column_letter(len(DISTRIBUTION_HEADERS))
-        ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{header_row}"
-        
-        # Auto-adjust columns based on headers (and data if present)
-        for col_idx in range(1, len(DISTRIBUTION_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = max(adjusted_width, 20)
+        ws.auto_filter.ref = f"A{header_row}:{_DISTRIBUTION_LAST_COLUMN}{header_row}"
         
-        return True
+        return row_count
     
     except Exception as e:
         logger.error(f"Error creating sheet: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+        return None
+
+
+def write_distribution_fast_table(filepath, data, filters=None):
+    """Write the distribution report straight to sheet XML for exports above FAST_WRITER_THRESHOLD rows,
+    with the same layout and styles as create_distribution_table"""
+    try:
+        rows = map(_distribution_row_values, data)
+        head = list(islice(rows, WIDTH_SAMPLE_ROWS))
+
+        # Filter block is framed by blank rows, as in create_distribution_table
+        filter_rows = _distribution_filter_rows(filters)
+        return write_table_xlsx(
+            filepath, "CASE DISTRIBUTION REPORT", "CASE DISTRIBUTION DRC TRANSACTION LIST", DISTRIBUTION_HEADERS, chain(head, rows),
+            filter_rows=[None, *filter_rows, None] if filter_rows is not None else [],
+            widths=column_widths(DISTRIBUTION_HEADERS, head)
+        )
+
+    except Exception as e:
+        logger.error(f"Error writing sheet: {str(e)}", exc_info=True)
+        return None
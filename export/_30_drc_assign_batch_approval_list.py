@@ -26,15 +26,17 @@ Program Description:
         d. Generates formatted Excel report
     - create_drc_assign_batch_approval_table(): Handles Excel sheet creation with:
         a. Professional formatting and styling
-        b. Dynamic column sizing
+        b. Write-only (streamed) rows with column widths sized before the first append
         c. Filter headers display
         d. Empty dataset handling
+    - write_drc_assign_batch_approval_fast_table(): Writes the same report straight to sheet XML
+      (fast_xlsx.py) when the result exceeds FAST_WRITER_THRESHOLD rows
 
 2. Data Flow:
     - Receives approver_ref parameter from calling function
     - Fetches data from Batch_Approval_log collection
     - Transforms MongoDB documents to Excel rows with proper formatting
-    - Applies consistent styling using STYLES configuration
+    - Applies consistent styling through the named styles registered from STYLES
     - Saves report to configured export directory
 
 3. Key Features:
@@ -81,12 +83,13 @@ Technical Specifications:
         - Maintains consistent formatting for empty result sets
 '''
 
-from datetime import datetime, timedelta
-from bson import ObjectId
+from itertools import chain, islice
+from bson import Decimal128
 from openpyxl import Workbook
-from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
+from utils.style_loader import register_named_styles
+from utils.excel_helpers import append_filter_row, append_header_row, append_main_header, filename_timestamp, format_datetime, format_object_id, set_column_widths, styled_cell, unique_now
+from utils.fast_xlsx import FAST_WRITER_THRESHOLD, write_table_xlsx
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -97,17 +100,77 @@ logger = getLogger('appLogger')
 DRC_ASSIGN_BATCH_APPROVAL_HEADERS = [
     "Batch_id", "created_dtm", "drc_commision_rule", "approval_type", "case_count", "total_arrears"
 ]
+_DRC_ASSIGN_BATCH_APPROVAL_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in DRC_ASSIGN_BATCH_APPROVAL_HEADERS)
+
+# Fetch only the exported fields from Template_forwarded_approver
+_DRC_ASSIGN_BATCH_APPROVAL_PROJECTION = {**{header: 1 for header in DRC_ASSIGN_BATCH_APPROVAL_HEADERS}, "_id": 0}
+
+# Column widths for exports above FAST_WRITER_THRESHOLD rows, tuned to the typical values
+# (24-char ObjectIds, 19-char timestamps) so large exports skip width tracking altogether
+_DRC_ASSIGN_BATCH_APPROVAL_FIXED_WIDTHS = {
+    "Batch_id": 31.2, "created_dtm": 25.2, "drc_commision_rule": 24,
+    "approval_type": 20, "case_count": 20, "total_arrears": 20
+}
+
+# Backs the approver_ref equality filter
+DRC_ASSIGN_BATCH_APPROVAL_INDEX = "batch_approval_export_idx"
+_DRC_ASSIGN_BATCH_APPROVAL_INDEX_KEYS = [("approver_ref", 1)]
+
+# Counts and amounts stay native numbers so both writers emit numeric cells, not text
+def _format_case_count(value):
+    return int(value) if isinstance(value, (int, float)) else value
+
+def _format_amount(value):
+    return float(value.to_decimal()) if isinstance(value, Decimal128) else value
+
+def _as_is(value):
+    return value
+
+_DRC_ASSIGN_BATCH_APPROVAL_FORMATTERS = {
+    "Batch_id": format_object_id,
+    "created_dtm": format_datetime,
+    "case_count": _format_case_count,
+    "total_arrears": _format_amount,
+}
+
+# (field, converter) per column in header order, resolved once instead of branching on every cell
+_DRC_ASSIGN_BATCH_APPROVAL_ROW_PLAN = tuple(
+    (header, _DRC_ASSIGN_BATCH_APPROVAL_FORMATTERS.get(header, _as_is))
+    for header in DRC_ASSIGN_BATCH_APPROVAL_HEADERS
+)
+
+def _drc_assign_batch_approval_row_values(record, _row_plan=_DRC_ASSIGN_BATCH_APPROVAL_ROW_PLAN):
+    """Pull the exported fields of one batch approval record in header order, converted for the sheet"""
+    get = record.get
+    return [fmt(get(header, "")) for header, fmt in _row_plan]
+
+def _drc_assign_batch_approval_rows(data):
+    """Convert batch approval records to sheet rows; returns (rows, column widths).
+    Widths are tracked as a running max while converting, not in a second pass"""
+    col_max = [len(title) for title in _DRC_ASSIGN_BATCH_APPROVAL_HEADER_TITLES]
+    rows = []
+    for record in data:
+        values = _drc_assign_batch_approval_row_values(record)
+        for col_idx, value in enumerate(values):
+            length = len(str(value)) if value else 0
+            if length > col_max[col_idx]:
+                col_max[col_idx] = length
+        rows.append(values)
+    return rows, [max((length + 2) * 1.2, 20) for length in col_max]
 
 def excel_drc_assign_batch_approval(approver_ref):
     """Fetch and export DRC assign batch approval data based on validated approver_ref parameter"""
     
     try:
-            # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            # Get export directory and query batch size from config
+            config = ConfigLoaderSingleton()
+            export_dir = config.get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            batch_approval_collection = db["Template_forwarded_approver"]
+            mongo = MongoDBConnectionSingleton()
+            batch_approval_collection = mongo.get_collection("Template_forwarded_approver")
+            if batch_approval_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
+            mongo.ensure_index("Template_forwarded_approver", _DRC_ASSIGN_BATCH_APPROVAL_INDEX_KEYS, DRC_ASSIGN_BATCH_APPROVAL_INDEX, background=True)
             batch_approval_query = {}
 
             # Check approver_ref
@@ -119,27 +182,38 @@ def excel_drc_assign_batch_approval(approver_ref):
 
             # Log and execute query
             logger.info(f"Executing query: {batch_approval_query}")
-            batches = list(batch_approval_collection.find(batch_approval_query))
-            logger.info(f"Found {len(batches)} matching batch records")
+            batches = batch_approval_collection.find(batch_approval_query, _DRC_ASSIGN_BATCH_APPROVAL_PROJECTION).batch_size(config.get_query_batch_size())  # Streamed into the sheet
 
             # Export to Excel even if no batches are found
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
+            timestamp = filename_timestamp(unique_now())
             filename = f"drc_assign_batch_approval_{timestamp}.xlsx"
             filepath = export_dir / filename
 
-            wb = Workbook()
-            wb.remove(wb.active)
+            filters = {"approver_ref": approver_ref}
+
+            # Look ahead just past the threshold to choose the writer without counting the cursor
+            records = iter(batches)
+            head = list(islice(records, FAST_WRITER_THRESHOLD + 1))
+            if len(head) > FAST_WRITER_THRESHOLD:
+                # Large exports skip openpyxl's per-cell objects
+                exported_count = write_drc_assign_batch_approval_fast_table(filepath, chain(head, records), filters)
+                if exported_count is None:
+                    raise Exception("Failed to write DRC assign batch approval sheet")
+            else:
+                wb = Workbook(write_only=True)
+                register_named_styles(wb)
+
+                exported_count = create_drc_assign_batch_approval_table(wb, head, filters)
+                if exported_count is None:
+                    raise Exception("Failed to create DRC assign batch approval sheet")
 
-            if not create_drc_assign_batch_approval_table(wb, batches, {
-                "approver_ref": approver_ref
-            }):
-                raise Exception("Failed to create DRC assign batch approval sheet")
+                wb.save(filepath)
+            logger.info(f"Found {exported_count} matching batch records")
 
-            wb.save(filepath)
-            if not batches:
+            if not exported_count:
                 print(f"No batch approval records found matching the selected filters. Exported empty table to: {filepath}")
             else:
-                print(f"\nSuccessfully exported {len(batches)} records to: {filepath}")
+                print(f"\nSuccessfully exported {exported_count} records to: {filepath}")
             return True
 
     except ValueError as ve:
@@ -156,72 +230,67 @@ def create_drc_assign_batch_approval_table(wb, data, filters=None):
     """Create formatted Excel sheet with DRC assign batch approval data, including headers even if no data"""
     try:
         ws = wb.create_sheet(title="DRC ASSIGN BATCH APPROVAL REPORT")
+
+        # Convert the records up front: write-only sheets need their column widths before the first append
+        rows, widths = _drc_assign_batch_approval_rows(data)
+        set_column_widths(ws, widths)
+
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(DRC_ASSIGN_BATCH_APPROVAL_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="DRC ASSIGN BATCH APPROVAL REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        append_main_header(ws, row_idx, "DRC ASSIGN BATCH APPROVAL REPORT", len(DRC_ASSIGN_BATCH_APPROVAL_HEADERS))
         row_idx += 1
         
         # Display Active Filters
         if filters:
+            ws.append([])
             row_idx += 1
             
             if filters.get('approver_ref'):
-                ws.cell(row=row_idx, column=2, value="Approver Reference:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['approver_ref']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+                append_filter_row(ws, "Approver Reference:", filters['approver_ref'])
                 row_idx += 1
             
+            ws.append([])
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(DRC_ASSIGN_BATCH_APPROVAL_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        append_header_row(ws, _DRC_ASSIGN_BATCH_APPROVAL_HEADER_TITLES)
         
-        # Data Rows (only if data exists)
-        if data:
-            for record in data:
-                row_idx += 1
-                for col_idx, header in enumerate(DRC_ASSIGN_BATCH_APPROVAL_HEADERS, 1):
-                    value = record.get(header, "")
-                    if header == "Batch_id" and isinstance(value, ObjectId):
-                        value = str(value)
-                    if header == "created_dtm" and isinstance(value, datetime):
-                        value = value.strftime('%Y-%m-%d %H:%M:%S')
-                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                    cell.font = STYLES['Border_Style']['font']
-                    cell.border = STYLES['Border_Style']['border']
-                    cell.alignment = STYLES['Border_Style']['alignment']
+        # Data Rows (only if data exists), one bulk append per row
+        for values in rows:
+            ws.append([styled_cell(ws, value, 'Border_Style') for value in values])
         
         # Add AutoFilter to headers
         last_col_letter = get_column_letter(len(DRC_ASSIGN_BATCH_APPROVAL_HEADERS))
         ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{header_row}"
         
-        # Auto-adjust columns based on headers (and data if present)
-        for col_idx in range(1, len(DRC_ASSIGN_BATCH_APPROVAL_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = max(adjusted_width, 20)
-        
-        return True
+        return len(rows)
     
     except Exception as e:
         logger.error(f"Error creating sheet: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+        return None
+
+
+def write_drc_assign_batch_approval_fast_table(filepath, data, filters=None):
+    """Write the DRC assign batch approval report straight to sheet XML for exports above FAST_WRITER_THRESHOLD rows,
+    with the same layout and styles as create_drc_assign_batch_approval_table"""
+    try:
+        # Filter block is framed by blank rows, as in create_drc_assign_batch_approval_table
+        filter_rows = []
+        if filters:
+            filter_rows.append(None)
+            if filters.get('approver_ref'):
+                filter_rows.append(("Approver Reference:", filters['approver_ref']))
+            filter_rows.append(None)
+
+        return write_table_xlsx(
+            filepath, "DRC ASSIGN BATCH APPROVAL REPORT", "DRC ASSIGN BATCH APPROVAL REPORT",
+            _DRC_ASSIGN_BATCH_APPROVAL_HEADER_TITLES, map(_drc_assign_batch_approval_row_values, data),
+            filter_rows=filter_rows,
+            widths=[_DRC_ASSIGN_BATCH_APPROVAL_FIXED_WIDTHS[header] for header in DRC_ASSIGN_BATCH_APPROVAL_HEADERS]
+        )
+
+    except Exception as e:
+        logger.error(f"Error writing DRC assign batch approval sheet: {str(e)}", exc_info=True)
+        return None
@@ -41,7 +41,7 @@ Program Description:
         - Valid DRC identifiers: "D1", "D2"
         - Valid batch IDs: 1, 2, 3
     - Data Formatting:
-        - Formats timestamps (YYYY-MM-DD HH:MM:SS)
+        - Formats timestamps (YYYY-MM-DD HH:MM:SS) in the aggregation ($dateToString)
         - Converts ObjectId to string
     - Error Handling:
         - Comprehensive validation errors
@@ -83,11 +83,12 @@ Technical Specifications:
 '''
 
 from datetime import datetime
-from bson import ObjectId
+from itertools import chain, islice
+from operator import itemgetter
 from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
+from utils.style_loader import register_named_styles
+from utils.excel_helpers import COLUMN_LETTERS, WIDTH_SAMPLE_ROWS, append_filter_row, append_header_row, append_main_header, fit_column_widths, format_object_id, styled_cell_factory
+from utils.cursor_prefetch import prefetched
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -98,6 +99,61 @@ logger = getLogger('appLogger')
 DRC_SUMMARY_HEADERS = [
     "created_dtm", "drc_id", "drc", "case_count", "tot_arrease", "proceed_on"
 ]
+_DRC_SUMMARY_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in DRC_SUMMARY_HEADERS)
+_DRC_SUMMARY_LAST_COLUMN = COLUMN_LETTERS[len(DRC_SUMMARY_HEADERS) - 1]
+
+def _date_text(field):
+    """$project expression rendering a date field as 'YYYY-MM-DD HH:MM:SS' text; other values pass through"""
+    return {"$cond": [
+        {"$eq": [{"$type": f"${field}"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d %H:%M:%S", "date": f"${field}"}},
+        f"${field}"
+    ]}
+
+# Final pipeline stage: only the exported fields of each summary. Dates are rendered as text on the
+# server (UTC, as the driver decodes them), so no datetime objects are built
+_DRC_SUMMARY_PROJECT_STAGE = {"$project": {
+    **{header: 1 for header in DRC_SUMMARY_HEADERS},
+    "_id": 0,
+    "created_dtm": _date_text("created_dtm"),
+    "proceed_on": _date_text("proceed_on"),
+}}
+
+# Equality on drc first, then case_distribution_batch_id
+DRC_SUMMARY_EXPORT_INDEX = "drc_summary_export_idx"
+_DRC_SUMMARY_EXPORT_INDEX_KEYS = [("drc", 1), ("case_distribution_batch_id", 1)]
+
+# created_dtm and proceed_on arrive already formatted from the pipeline
+_DRC_SUMMARY_FORMATTERS = {"drc_id": format_object_id}
+
+# Per-column value converters aligned with DRC_SUMMARY_HEADERS (None = written as-is)
+_DRC_SUMMARY_COL_FORMATTERS = tuple(_DRC_SUMMARY_FORMATTERS.get(header) for header in DRC_SUMMARY_HEADERS)
+
+# All exported fields in one C-level call; raises KeyError when a document lacks one of them
+_DRC_SUMMARY_FIELDS = itemgetter(*DRC_SUMMARY_HEADERS)
+
+def _drc_summary_row_values(record, _fields=_DRC_SUMMARY_FIELDS, _headers=tuple(DRC_SUMMARY_HEADERS), _formatters=_DRC_SUMMARY_COL_FORMATTERS):
+    """Pull the exported fields of one DRC summary in header order, converted for the sheet"""
+    try:
+        values = _fields(record)
+    except KeyError:
+        # Missing fields are written as ""
+        get = record.get
+        values = [get(header, "") for header in _headers]
+    return [fmt(value) if fmt is not None else value for value, fmt in zip(values, _formatters)]
+
+def _drc_summary_filter_rows(filters):
+    """Active filters as (label, value) rows in display order; None when no filter block is shown"""
+    if not filters:
+        return None
+    filter_rows = []
+    if filters.get('task_id'):
+        filter_rows.append(("Task ID:", str(filters['task_id'])))
+    if filters.get('drc'):
+        filter_rows.append(("DRC:", filters['drc']))
+    if filters.get('case_distribution_batch_id') is not None:
+        filter_rows.append(("Case Distribution Batch ID:", str(filters['case_distribution_batch_id'])))
+    return filter_rows
 
 def excel_drc_summary_detail(drc_id, drc, case_distribution_batch_id):
     """Fetch and export DRC summary details with a fixed Task_Id of 32 based on validated parameters"""
@@ -105,66 +161,70 @@ def excel_drc_summary_detail(drc_id, drc, case_distribution_batch_id):
     
     try:
             
-            # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            # Get export directory and query batch size from config
+            config = ConfigLoaderSingleton()
+            export_dir = config.get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            case_distribution_collection = db["Case_distribution_drc_summary"]
+            mongo = MongoDBConnectionSingleton()
+            case_distribution_collection = mongo.get_collection("Case_distribution_drc_summary")
+            if case_distribution_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
+            index_ready = mongo.ensure_index("Case_distribution_drc_summary", _DRC_SUMMARY_EXPORT_INDEX_KEYS, DRC_SUMMARY_EXPORT_INDEX, background=True)
             case_distribution_query = {}
 
             # Check each parameter and build query
 
             # check drc
             if drc is not None:
-                if drc == "D1":
-                    case_distribution_query[drc] = {"$regex": f"^{drc}$"}
-                elif drc == "D2":
-                    case_distribution_query[drc] = drc
+                if drc in ("D1", "D2"):
+                    case_distribution_query["drc"] = drc
                 else:
                     raise ValueError(f"Invalid drc '{drc}'. Must be 'D1', or 'D2'")
             
 
             # check case_distribution_batch_id 
             if case_distribution_batch_id is not None:
-                if case_distribution_batch_id == 1:
-                    case_distribution_query[case_distribution_batch_id] = {"$regex": f"^{case_distribution_batch_id}$"}
-                elif case_distribution_batch_id == 2:
-                    case_distribution_query[case_distribution_batch_id] = case_distribution_batch_id
-                elif case_distribution_batch_id == 3:
-                    case_distribution_query[case_distribution_batch_id] = case_distribution_batch_id
+                if case_distribution_batch_id in (1, 2, 3):
+                    case_distribution_query["case_distribution_batch_id"] = case_distribution_batch_id
                 else:
                     raise ValueError(f"Invalid case distribution batch id '{case_distribution_batch_id}'. Must be 1, 2, or 3")
 
 
+            # $match first so the index serves it, then trim and format each summary on the server
+            pipeline = [{"$match": case_distribution_query}, _DRC_SUMMARY_PROJECT_STAGE]
+            aggregate_options = {"batchSize": config.get_query_batch_size(), "allowDiskUse": True}
+            if index_ready and "drc" in case_distribution_query:
+                # Only hint when the index prefix is filtered; otherwise the hint would force a full index scan
+                aggregate_options["hint"] = DRC_SUMMARY_EXPORT_INDEX
+
             #log and excute query
-            logger.info(f"Executing query on Case_Distribution_DRC_Summary: {case_distribution_query}")
-            summaries = list(case_distribution_collection.find(case_distribution_query)) #fetch data into array
-            logger.info(f"Found {len(summaries)} matching DRC summary records")
+            logger.info(f"Executing pipeline on Case_Distribution_DRC_Summary: {pipeline}")
+            summaries = case_distribution_collection.aggregate(pipeline, **aggregate_options)  # Streamed into the sheet
 
-            if not summaries:
-                print("No DRC summary records found matching the selected filters")
-                return False
+            # The cursor is read on a background thread, so its round trips overlap with writing the sheet
+            records = prefetched(summaries)
 
             # Export to Excel even if no incidents are found
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
             filename = f"drc_summary_{timestamp}.xlsx"
             filepath = export_dir / filename
 
-            wb = Workbook()
-            wb.remove(wb.active)
+            wb = Workbook(write_only=True)
+            register_named_styles(wb)
 
-            if not create_drc_summary_table(wb, summaries, {
+            exported_count = create_drc_summary_table(wb, records, {
                 "drc": drc,
                 "case_distribution_batch_id": case_distribution_batch_id
-            }):
+            })
+            if exported_count is None:
                 raise Exception("Failed to create DRC summary sheet")
 
             wb.save(filepath)
-            if not summaries:
-                print("No drc summaries found matching the selected filters. Exported empty table to: {filepath}")
+            logger.info(f"Found {exported_count} matching DRC summary records")
+            if not exported_count:
+                print(f"No DRC summary records found matching the selected filters. Exported empty table to: {filepath}")
             else:
-                print(f"\nSuccessfully exported {len(summaries)} DRC summary records to: {filepath}")
+                print(f"\nSuccessfully exported {exported_count} DRC summary records to: {filepath}")
             return True
 
     except ValueError as ve:
@@ -182,95 +242,50 @@ def create_drc_summary_table(wb, data, filters=None):
     """Create formatted Excel sheet with DRC summary data, including headers even if no data"""
     try:
         ws = wb.create_sheet(title="DRC SUMMARY REPORT")
+
+        # Column widths are written ahead of the rows in write-only mode, so size them in one pass
+        # from the headers, the filter block (columns B and C) and a buffered head of the data
+        filter_rows = _drc_summary_filter_rows(filters)
+        records = iter(data)
+        head = [_drc_summary_row_values(record) for record in islice(records, WIDTH_SAMPLE_ROWS)]
+        filter_cells = [(None, label, value) for label, value in filter_rows or ()]
+        fit_column_widths(ws, _DRC_SUMMARY_HEADER_TITLES, chain(head, filter_cells))
+
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(DRC_SUMMARY_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="DRC SUMMARY REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        append_main_header(ws, row_idx, "DRC SUMMARY REPORT", len(DRC_SUMMARY_HEADERS))
         row_idx += 1
         
         # Display Active Filters
-        if filters:
+        if filter_rows is not None:
+            ws.append([])
             row_idx += 1
             
-            # Task ID filter
-            if filters.get('task_id'):
-                ws.cell(row=row_idx, column=2, value="Task ID:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=str(filters['task_id'])).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            # DRC filter
-            if filters.get('drc'):
-                ws.cell(row=row_idx, column=2, value="DRC:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['drc']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            # Case Distribution Batch ID filter
-            if filters.get('case_distribution_batch_id') is not None:
-                ws.cell(row=row_idx, column=2, value="Case Distribution Batch ID:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=str(filters['case_distribution_batch_id'])).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+            for label, value in filter_rows:
+                append_filter_row(ws, label, value)
                 row_idx += 1
             
+            ws.append([])
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(DRC_SUMMARY_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        append_header_row(ws, _DRC_SUMMARY_HEADER_TITLES)
         
-        # Data Rows (only if data exists)
-        if data:
-            for record in data:
-                row_idx += 1
-                for col_idx, header in enumerate(DRC_SUMMARY_HEADERS, 1):
-                    value = record.get(header, "")
-                    if header == "drc_id" and isinstance(value, ObjectId):
-                        value = str(value)
-                    if header == "created_dtm" and isinstance(value, datetime):
-                        value = value.strftime('%Y-%m-%d %H:%M:%S')
-                    if header == "proceed_on" and isinstance(value, datetime):
-                        value = value.strftime('%Y-%m-%d %H:%M:%S')
-                    cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                    cell.font = STYLES['Border_Style']['font']
-                    cell.border = STYLES['Border_Style']['border']
-                    cell.alignment = STYLES['Border_Style']['alignment']
+        # Data Rows (only if data exists); the row style is resolved once, not per cell
+        border_cell = styled_cell_factory(ws, 'Border_Style')
+        append = ws.append
+        row_count = 0
+        for values in chain(head, map(_drc_summary_row_values, records)):
+            append([border_cell(value) for value in values])
+            row_count += 1
         
         # Add AutoFilter to headers
-        last_col_letter = get_column_letter(len(DRC_SUMMARY_HEADERS))
-        ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{header_row}"
-        
-        # Auto-adjust columns based on headers (and data if present)
-        for col_idx in range(1, len(DRC_SUMMARY_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = max(adjusted_width, 20)
+        ws.auto_filter.ref = f"A{header_row}:{_DRC_SUMMARY_LAST_COLUMN}{header_row}"
         
-        return True
+        return row_count
     
     except Exception as e:
         logger.error(f"Error creating DRC summary sheet: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+        return None
@@ -26,16 +26,18 @@ Program Description:
         d. Generates formatted Excel report
     - create_approval_table(): Handles Excel sheet creation with:
         a. Professional formatting and styling
-        b. Dynamic column sizing
+        b. Write-only (streamed) rows with column widths sized before the first append
         c. Filter headers display
         d. Empty dataset handling
+    - write_approval_fast_table(): Writes the same report straight to sheet XML
+      (fast_xlsx.py) when the result exceeds FAST_WRITER_THRESHOLD rows
 
 2. Data Flow:
     - Receives filter parameters from calling function
     - Fetches data from Template_forwarded_approver collection
     - Flattens nested approval array structure
     - Transforms MongoDB documents to Excel rows
-    - Applies consistent styling using STYLES configuration
+    - Applies consistent styling through the named styles registered from STYLES
     - Saves report to configured export directory
 
 3. Key Features:
@@ -46,7 +48,7 @@ Program Description:
     - Special Data Processing:
         - Handles nested approval array data
         - Converts ObjectId to string
-        - Formats datetime objects
+        - Formats datetime values in the aggregation ($dateToString)
     - Error Handling:
         - Comprehensive validation errors
         - Database operation failures
@@ -82,16 +84,17 @@ Technical Specifications:
     - Collections Accessed:
         - Template_forwarded_approver (primary data source)
     - Special Processing:
-        - Extracts and flattens data from nested "approve" array
+        - Flattens the nested "approve" array with a $unwind aggregation
         - Filters approval records by type if specified
 '''
 
 from datetime import datetime, timedelta
-from bson import ObjectId
+from itertools import chain, islice
 from openpyxl import Workbook
-from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
+from utils.style_loader import register_named_styles
+from utils.excel_helpers import append_filter_row, append_header_row, append_main_header, filename_timestamp, format_object_id, set_column_widths, styled_cell, unique_now
+from utils.fast_xlsx import FAST_WRITER_THRESHOLD, write_table_xlsx
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -99,9 +102,78 @@ from utils.config_loader import ConfigLoaderSingleton
 logger = getLogger('appLogger')
 
 APPROVAL_HEADERS = [
-    "approver_reference", "created_dtm", "created_by", "approval_type",
+    "case_id", "created_dtm", "created_by", "approval_type",
     "approve_status", "approved_by", "remark"
 ]
+_APPROVAL_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in APPROVAL_HEADERS)
+
+# Column widths for exports above FAST_WRITER_THRESHOLD rows, tuned to the typical values
+# (19-char timestamps, free-text remarks) so large exports skip width tracking altogether
+_APPROVAL_FIXED_WIDTHS = {
+    "case_id": 24, "created_dtm": 25.2, "created_by": 20, "approval_type": 20,
+    "approve_status": 20, "approved_by": 20, "remark": 40
+}
+
+# Final pipeline stage: only the exported fields of each flattened approval. Dates are rendered as
+# 'YYYY-MM-DD HH:MM:SS' text on the server (UTC, as the driver decodes them), so no datetime objects are built
+_APPROVAL_PROJECT_STAGE = {"$project": {
+    "_id": 0,
+    "case_id": 1, "created_by": 1,
+    "created_dtm": {"$cond": [
+        {"$eq": [{"$type": "$created_dtm"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d %H:%M:%S", "date": "$created_dtm"}},
+        "$created_dtm"
+    ]},
+    "approval_type": "$approve.approval_type",
+    "approve_status": "$approve.approve_status",
+    "approved_by": "$approve.approved_by",
+    "remark": "$approve.remark",
+}}
+
+# Equality field first, then the Created_Dtm range; serves the pipeline's leading $match
+APPROVAL_EXPORT_INDEX = "approval_export_idx"
+_APPROVAL_EXPORT_INDEX_KEYS = [("approval_type", 1), ("Created_Dtm", 1)]
+
+def _as_is(value):
+    return value
+
+# created_dtm arrives already formatted from the pipeline
+_APPROVAL_FORMATTERS = {"case_id": format_object_id}
+
+# (field, converter) per column in header order, resolved once instead of branching on every cell
+_APPROVAL_ROW_PLAN = tuple((header, _APPROVAL_FORMATTERS.get(header, _as_is)) for header in APPROVAL_HEADERS)
+
+def _approval_row_values(record, _row_plan=_APPROVAL_ROW_PLAN):
+    """Pull the exported fields of one flattened approval in header order, converted for the sheet"""
+    get = record.get
+    return [fmt(get(header, "")) for header, fmt in _row_plan]
+
+def _approval_rows(data):
+    """Convert approval records to sheet rows; returns (rows, column widths).
+    Widths are tracked as a running max while converting, not in a second pass"""
+    col_max = [len(title) for title in _APPROVAL_HEADER_TITLES]
+    rows = []
+    for record in data:
+        values = _approval_row_values(record)
+        for col_idx, value in enumerate(values):
+            length = len(str(value)) if value else 0
+            if length > col_max[col_idx]:
+                col_max[col_idx] = length
+        rows.append(values)
+    return rows, [max((length + 2) * 1.2, 20) for length in col_max]
+
+def _approval_filter_rows(filters):
+    """Active-filter (label, value) rows for the report, or None when no filters were passed"""
+    if not filters:
+        return None
+    filter_rows = []
+    if filters.get('approval_type'):
+        filter_rows.append(("Approval Type:", filters['approval_type']))
+    if filters.get('date_range') and any(filters['date_range']):
+        start, end = filters['date_range']
+        date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
+        filter_rows.append(("Date Range:", date_str))
+    return filter_rows
 
 
 def excel_drc_approval_detail(approval_type, from_date, to_date):
@@ -110,25 +182,30 @@ def excel_drc_approval_detail(approval_type, from_date, to_date):
     
     try:
 
-            # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            # Get export directory and query batch size from config
+            config = ConfigLoaderSingleton()
+            export_dir = config.get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            collection = db["Template_forwarded_approver"]
+            mongo = MongoDBConnectionSingleton()
+            collection = mongo.get_collection("Template_forwarded_approver")
+            if collection is None:
+                raise ConnectionError("MongoDB connection is not available")
+            mongo.ensure_index("Template_forwarded_approver", _APPROVAL_EXPORT_INDEX_KEYS, APPROVAL_EXPORT_INDEX, background=True)
             query = {}
 
 
              # If approval_type is provided, filter within the approve array
             if approval_type is not None:
                 if approval_type == "a1":
-                    query["approval_type"] = {"$regex": f"^{approval_type}$"}
+                    # Exact match; equality (unlike an anchored regex) lets the index serve it
+                    query["approval_type"] = approval_type
                 elif approval_type == "a2":
                     query["Incident_Status"] = approval_type
                 else:
                     raise ValueError(f"Invalid approval type '{approval_type}'. Must be 'a1', 'a2'")
 
-             # Check date range
+             # Check date range; the parsed dates are reused for the filter block
+            from_dt = to_dt = None
             if from_date is not None and to_date is not None:
                 try:
                     # Check if from_date and to_date are in correct YYYY-MM-DD format
@@ -151,50 +228,50 @@ def excel_drc_approval_detail(approval_type, from_date, to_date):
            
                     
 
-            logger.info(f"Executing query on Template_forwarded_approver: {query}")
-            cases = list(collection.find(query))
-            logger.info(f"Found {len(cases)} matching case records")
-
-            if not cases:
-                print("No approval records found matching the selected filters")
-                return False
-
-            # Process data to flatten the approve array
-            processed_data = []
-            for case in cases:
-                for approval in case.get("approve", []):
-                    if not approval_type or approval.get("approval_type") == approval_type:
-                        processed_data.append({
-                            "case_id": case.get("case_id", ""),
-                            "created_dtm": case.get("created_dtm", ""),
-                            "created_by": case.get("created_by", ""),
-                            "approval_type": approval.get("approval_type", ""),
-                            "approve_status": approval.get("approve_status", ""),
-                            "approved_by": approval.get("approved_by", ""),
-                            "remark": approval.get("remark", "")
-                        })
-
-            if not processed_data:
-                print("No approval records found within the approve array matching the filters")
-                return False
-
-            # Export to Excel
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
+            # Flatten the approve array on the server: one output document per matching approval,
+            # carrying only the exported fields
+            pipeline = [
+                {"$match": query},
+                {"$unwind": "$approve"},
+                *([{"$match": {"approve.approval_type": approval_type}}] if approval_type else []),
+                _APPROVAL_PROJECT_STAGE,
+            ]
+
+            logger.info(f"Executing pipeline on Template_forwarded_approver: {pipeline}")
+            approvals = collection.aggregate(pipeline, batchSize=config.get_query_batch_size(), allowDiskUse=True)  # Streamed into the sheet
+
+            # Look ahead just past the threshold to choose the writer without counting the cursor
+            records = iter(approvals)
+            head = list(islice(records, FAST_WRITER_THRESHOLD + 1))
+
+            # Export to Excel even if no approvals are found
+            timestamp = filename_timestamp(unique_now())
             filename = f"drc_approval_{timestamp}.xlsx"
             filepath = export_dir / filename
 
-            wb = Workbook()
-            wb.remove(wb.active)
-
-            if not create_approval_table(wb, processed_data, {
+            filters = {
                 "approval_type": approval_type,
-                "date_range": (datetime.strptime(from_date, '%Y-%m-%d') if from_date else None,
-                            datetime.strptime(to_date, '%Y-%m-%d') if to_date else None)
-            }):
-                raise Exception("Failed to create DRC approval sheet")
+                "date_range": (from_dt, to_dt)
+            }
+            if len(head) > FAST_WRITER_THRESHOLD:
+                # Large exports skip openpyxl's per-cell objects
+                exported_count = write_approval_fast_table(filepath, chain(head, records), filters)
+                if exported_count is None:
+                    raise Exception("Failed to write DRC approval sheet")
+            else:
+                wb = Workbook(write_only=True)
+                register_named_styles(wb)
 
-            wb.save(filepath)
-            print(f"\nSuccessfully exported {len(processed_data)} DRC approval records to: {filepath}")
+                exported_count = create_approval_table(wb, head, filters)
+                if exported_count is None:
+                    raise Exception("Failed to create DRC approval sheet")
+
+                wb.save(filepath)
+            logger.info(f"Found {exported_count} matching approval records")
+            if not exported_count:
+                print(f"No approval records found matching the selected filters. Exported empty table to: {filepath}")
+            else:
+                print(f"\nSuccessfully exported {exported_count} DRC approval records to: {filepath}")
             return True
 
     except ValueError as ve:
@@ -210,85 +287,64 @@ def create_approval_table(wb, data, filters=None):
     """Create formatted Excel sheet with DRC approval data"""
     try:
         ws = wb.create_sheet(title="DRC APPROVAL REPORT")
+
+        # Convert the records up front: write-only sheets need their column widths before the first append
+        rows, widths = _approval_rows(data)
+        set_column_widths(ws, widths)
+
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(APPROVAL_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="DRC APPROVAL REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        append_main_header(ws, row_idx, "DRC APPROVAL REPORT", len(APPROVAL_HEADERS))
         row_idx += 1
         
-        # Display Active Filters
-        if filters:
+        # Display Active Filters (Approval Type, Date Range)
+        filter_rows = _approval_filter_rows(filters)
+        if filter_rows is not None:
+            ws.append([])
             row_idx += 1
             
-            # Approval Type filter
-            if filters.get('approval_type'):
-                ws.cell(row=row_idx, column=2, value="Approval Type:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['approval_type']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            # Date Range filter
-            if filters.get('date_range') and any(filters['date_range']):
-                start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+            for label, value in filter_rows:
+                append_filter_row(ws, label, value)
                 row_idx += 1
             
+            ws.append([])
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(APPROVAL_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        append_header_row(ws, _APPROVAL_HEADER_TITLES)
         
-        # Data Rows
-        for record in data:
-            row_idx += 1
-            for col_idx, header in enumerate(APPROVAL_HEADERS, 1):
-                value = record.get(header, "")
-                if header == "case_id" and isinstance(value, ObjectId):
-                    value = str(value)
-                if header == "created_dtm" and isinstance(value, datetime):
-                    value = value.strftime('%Y-%m-%d %H:%M:%S')
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = STYLES['Border_Style']['font']
-                cell.border = STYLES['Border_Style']['border']
-                cell.alignment = STYLES['Border_Style']['alignment']
+        # Data Rows, one bulk append per row
+        for values in rows:
+            ws.append([styled_cell(ws, value, 'Border_Style') for value in values])
+        row_idx += len(rows)
         
         # Add AutoFilter to all columns
-        if data:
+        if rows:
             last_col_letter = get_column_letter(len(APPROVAL_HEADERS))
             ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{row_idx}"
         
-        # Auto-adjust columns
-        for col_idx in range(1, len(APPROVAL_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = adjusted_width
-        
-        return True
+        return len(rows)
     
     except Exception as e:
         logger.error(f"Error creating DRC approval sheet: {str(e)}", exc_info=True)
-        return False
\ No newline at end of file
+        return None
+
+
+def write_approval_fast_table(filepath, data, filters=None):
+    """Write the DRC approval report straight to sheet XML for exports above FAST_WRITER_THRESHOLD rows,
+    with the same layout and styles as create_approval_table"""
+    try:
+        # Filter block is framed by blank rows, as in create_approval_table
+        filter_rows = _approval_filter_rows(filters)
+        return write_table_xlsx(
+            filepath, "DRC APPROVAL REPORT", "DRC APPROVAL REPORT", _APPROVAL_HEADER_TITLES, map(_approval_row_values, data),
+            filter_rows=[None, *filter_rows, None] if filter_rows is not None else [],
+            widths=[_APPROVAL_FIXED_WIDTHS[header] for header in APPROVAL_HEADERS],
+            autofilter_rows=True
+        )
+
+    except Exception as e:
+        logger.error(f"Error writing DRC approval sheet: {str(e)}", exc_info=True)
+        return None
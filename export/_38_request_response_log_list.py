@@ -93,6 +93,7 @@ from openpyxl import Workbook
 from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
 from utils.style_loader import STYLES
+from utils.excel_helpers import write_filter_row, write_header_row, write_main_header
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -109,21 +110,18 @@ def excel_case_detail(case_current_status, date_from, date_to):
     
     try:   
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            export_dir = ConfigLoaderSingleton().get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            collection = db["Case_log"]
+            mongo = MongoDBConnectionSingleton()
+            collection = mongo.get_collection("Case_log")
+            if collection is None:
+                raise ConnectionError("MongoDB connection is not available")
             query = {} 
 
             # Check case_current_status parameter
             if case_current_status is not None:
-                if case_current_status == "Pending FMB":
-                     query["Status"] == {"$regex": f"^{case_current_status}$"}
-                elif case_current_status == "In progress":
-                     query["Status"] == case_current_status
-                elif case_current_status == "Closed":
-                     query["Status"] == case_current_status     
+                if case_current_status in ("Pending FMB", "In progress", "Closed"):
+                    query["Status"] = case_current_status
                 else:
                     raise ValueError(f"Invalid case_current_status '{case_current_status}'. Must be 'Pending FMB', 'In progress', 'Closed' ")
                 
@@ -193,11 +191,7 @@ def create_case_table(wb, data, filters=None):
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(CASE_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="CASE REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        write_main_header(ws, row_idx, "CASE REPORT", len(CASE_HEADERS))
         row_idx += 1
         
         # Display Active Filters
@@ -205,36 +199,20 @@ def create_case_table(wb, data, filters=None):
             row_idx += 1
             
             if filters.get('status'):
-                ws.cell(row=row_idx, column=2, value="Status:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['status']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+                write_filter_row(ws, row_idx, "Status:", filters['status'])
                 row_idx += 1
             
             if filters.get('date_range') and any(filters['date_range']):
                 start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
                 date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+                write_filter_row(ws, row_idx, "Date Range:", date_str)
                 row_idx += 1
             
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(CASE_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header)
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        write_header_row(ws, row_idx, CASE_HEADERS, width=20)
         
         # Data Rows (only if data exists)
         if data:
@@ -80,16 +80,19 @@ Technical Specifications:
         - Incident (primary data source)
         - Filters specifically for "Incident_Status": "Incident Reject"
     - Special Data Handling:
-        - Converts ObjectId to string for Incident_Id
-        - Formats datetime objects for Created_Dtm and Rejected_Dtm
+        - Converts ObjectId to string for Incident_Id (in the aggregation, $toString)
+        - Formats datetime objects for Created_Dtm (in the aggregation, $dateToString)
 '''
 
-from datetime import datetime, timedelta
-from bson import ObjectId
+from functools import partial
+from operator import itemgetter
+from itertools import chain, islice
 from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
+from utils.style_loader import register_named_styles
+from utils.download_log import record_download
+from utils.excel_helpers import COLUMN_LETTERS, WIDTH_SAMPLE_ROWS, append_filter_row, append_header_row, append_main_header, column_widths, filename_timestamp, fit_column_widths, styled_cell_factory, unique_now
+from utils.fast_xlsx import EXPORT_SEGMENT_ROWS, FAST_WRITER_THRESHOLD, write_segmented_xlsx, write_table_xlsx
+from utils.cursor_prefetch import prefetched
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -98,24 +101,71 @@ logger = getLogger('appLogger')
 
 DIGITAL_SIGNATURES_HEADERS = [
     "case_id", "case_status", "account_no", "created_dtm", "case_current_status"]
+_DIGITAL_SIGNATURES_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in DIGITAL_SIGNATURES_HEADERS)
+_DIGITAL_SIGNATURES_LAST_COLUMN = COLUMN_LETTERS[len(DIGITAL_SIGNATURES_HEADERS) - 1]
 
-def excel_digital_signature_detail(case_current_status):
+# Final pipeline stage: only the exported fields of each case. The id is rendered as text and dates as
+# 'YYYY-MM-DD HH:MM:SS' text on the server (UTC, as the driver decodes them), so no ObjectId or datetime objects are built
+_DIGITAL_SIGNATURES_PROJECT_STAGE = {"$project": {
+    **{header: 1 for header in DIGITAL_SIGNATURES_HEADERS},
+    "_id": 0,
+    "case_id": {"$cond": [
+        {"$eq": [{"$type": "$case_id"}, "objectId"]},
+        {"$toString": "$case_id"},
+        "$case_id"
+    ]},
+    "created_dtm": {"$cond": [
+        {"$eq": [{"$type": "$created_dtm"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d %H:%M:%S", "date": "$created_dtm"}},
+        "$created_dtm"
+    ]},
+}}
+
+# Backs the Case_current_starus equality filter
+DIGITAL_SIGNATURES_EXPORT_INDEX = "digital_signatures_export_idx"
+_DIGITAL_SIGNATURES_EXPORT_INDEX_KEYS = [("Case_current_starus", 1)]
+
+# All exported fields in one C-level call; raises KeyError when a document lacks one of them
+_DIGITAL_SIGNATURES_FIELDS = itemgetter(*DIGITAL_SIGNATURES_HEADERS)
+
+def _digital_signature_row_values(record, _fields=_DIGITAL_SIGNATURES_FIELDS, _headers=tuple(DIGITAL_SIGNATURES_HEADERS)):
+    """Pull the exported fields of one case in header order; the case_id and created_dtm columns arrive already converted from the pipeline"""
+    try:
+        return _fields(record)
+    except KeyError:
+        # Missing fields are written as ""
+        get = record.get
+        return [get(header, "") for header in _headers]
+
+def _digital_signature_filter_rows(filters):
+    """Rows between the title and the header: a blank row, then each active filter as a (label, value) pair"""
+    if not filters:
+        return []
+    filter_rows = [None]
+    # Case_current_starus filter
+    if filters.get('Case_current_status'):
+        filter_rows.append(("Case Current Status:", filters['Case_current_status']))
+    return filter_rows
+
+
+def excel_digital_signature_detail(case_current_status, segment_size=EXPORT_SEGMENT_ROWS):
     """Fetch and export digital signature details from Incident collection"""
 
     try:
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            config = ConfigLoaderSingleton()
+            export_dir = config.get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            case_details_collection = db["case_details"]
+            mongo = MongoDBConnectionSingleton()
+            case_details_collection = mongo.get_collection("case_details")
+            if case_details_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
+            index_ready = mongo.ensure_index("case_details", _DIGITAL_SIGNATURES_EXPORT_INDEX_KEYS, DIGITAL_SIGNATURES_EXPORT_INDEX, background=True)
             case_current_query = {}  
 
             # Validate and apply actions filter
             if case_current_status is not None:
-                if case_current_status == "Abandand":
-                    case_current_query["Case_current_starus"] = {"$regex": f"^{case_current_status}$"}
-                elif case_current_status == "LIT prescribed":
+                if case_current_status in ("Abandand", "LIT prescribed"):
                     case_current_query["Case_current_starus"] = case_current_status
                 else:
                      raise ValueError(f"Invalid actions '{case_current_status}'. Must be 'Abandand', 'LIT prescribed'")
@@ -125,48 +175,87 @@ def excel_digital_signature_detail(case_current_status):
            
 
 
-            logger.info(f"Executing query on Incident for rejected case: {case_current_query}")
-            case = list(case_details_collection.find(case_current_query))
-            logger.info(f"Found {len(case)} matching rejected case")
+            # $match first so the index serves it, then convert and trim each case on the server
+            pipeline = [{"$match": case_current_query}, _DIGITAL_SIGNATURES_PROJECT_STAGE]
+            # The export is unbounded, so let the server spill to disk rather than fail on its memory limit
+            aggregate_options = {"batchSize": config.get_query_batch_size(), "allowDiskUse": True}
+            if index_ready and "Case_current_starus" in case_current_query:
+                # Only hint when the indexed field is filtered; otherwise the hint would force a full index scan
+                aggregate_options["hint"] = DIGITAL_SIGNATURES_EXPORT_INDEX
+                if config.get_explain_queries():
+                    # Development check that the leading $match is still served by the index
+                    mongo.log_query_plan("case_details", pipeline, hint=DIGITAL_SIGNATURES_EXPORT_INDEX)
+
+            logger.info(f"Executing pipeline on case_details for digital signature cases: {pipeline}")
+            case = case_details_collection.aggregate(pipeline, **aggregate_options)  # Streamed into the sheet
 
             # Export to Excel
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
+            # One clock read for the filename and the Download records; unique_now() never repeats a stamp, so
+            # exports started in the same microsecond still get distinct files
+            now_dt = unique_now()
+            timestamp = filename_timestamp(now_dt)
             filename = f"digital_signatures_relavent_lod_{timestamp}.xlsx"
             filepath = export_dir / filename
 
-            wb = Workbook()
-            wb.remove(wb.active)
-
-            if not create_digital_signature_table(wb, case, {
+            filters = {
                 "Case_current_status": case_current_status
+            }
+
+            # Look ahead just past the threshold to choose the writer without counting the cursor; the cursor
+            # is read on a background thread from here on, so its round trips overlap with writing the sheet
+            records = prefetched(case)
+            head = list(islice(records, FAST_WRITER_THRESHOLD + 1))
+            if len(head) > FAST_WRITER_THRESHOLD:
+                # Results above segment_size rows are split across several files
+                parts = write_segmented_xlsx(filepath, chain(head, records), partial(write_digital_signature_fast_table, filters=filters), segment_size)
+                if parts is None:
+                    raise Exception("Failed to write digital signatures sheet")
+                exported_count = sum(part_count for _, part_count in parts)
+            else:
+                wb = Workbook(write_only=True)
+                register_named_styles(wb)
 
-            }):
-                raise Exception("Failed to create digital signatures sheet")
+                exported_count = create_digital_signature_table(wb, head, filters)
+                if exported_count is None:
+                    raise Exception("Failed to create digital signatures sheet")
 
-            wb.save(filepath)
+                wb.save(filepath)
+                parts = [(filepath, exported_count)]
+            logger.info(f"Found {exported_count} matching digital signature cases")
 
-             # Write export record to Download collection
-            try:
-                download_collection = db["file_download_log"]
+            applied_filters = {
+                "Case_current_status" : case_current_status
+            }
+            if len(parts) > 1:
+                # One Download record per part file
+                first_row = 1
+                for part_number, (part_path, part_count) in enumerate(parts, 1):
+                    record_download({
+                        "File_Name": part_path.name,
+                        "File_Path": str(part_path),
+                        "Export_Timestamp": now_dt,
+                        "Exported_Record_Count": part_count,
+                        "Part_Number": part_number,
+                        "Record_Range": f"{first_row}-{first_row + part_count - 1}",
+                        "Applied_Filters": applied_filters
+                    })
+                    first_row += part_count
+            else:
                 export_record = {
                     "File_Name": filename,
                     "File_Path": str(filepath),
-                    "Export_Timestamp": datetime.now(),
-                    "Exported_Record_Count": len(case),
-                    "Applied_Filters": {
-                        "Case_current_status" : case_current_status
-                    }
+                    "Export_Timestamp": now_dt,
+                    "Exported_Record_Count": exported_count,
+                    "Applied_Filters": applied_filters
                 }
-                download_collection.insert_one(export_record)
-                logger.info("Export details written to Download collection.")
-            except Exception as e:
-                logger.error(f"Failed to insert download record: {str(e)}", exc_info=True)
+                # Queue export record for the Download collection; written by the background log worker
+                record_download(export_record)
 
 
-            if not case:
-                print("No digital signatures found matching the selected filters. Exported empty table to: {filepath}")
-            else:    
-                print(f"\nSuccessfully exported {len(case)} signatures records to: {filepath}")
+            if not exported_count:
+                print(f"No digital signatures found matching the selected filters. Exported empty table to: {filepath}")
+            else:
+                print(f"\nSuccessfully exported {exported_count} signatures records to: {', '.join(str(part_path) for part_path, _ in parts)}")
             return True            
            
     except ValueError as ve:
@@ -184,72 +273,64 @@ def create_digital_signature_table(wb, data, filters=None):
     """Create formatted Excel sheet with digital signature data"""
     try:
         ws = wb.create_sheet(title="DIGITAL SIGNATURES RELAVENT LOD REPORT")
+
+        # Column widths are written ahead of the rows in write-only mode, so size them
+        # from the headers and a buffered head of the data in one pass
+        records = iter(data)
+        head = [_digital_signature_row_values(record) for record in islice(records, WIDTH_SAMPLE_ROWS)]
+        fit_column_widths(ws, _DIGITAL_SIGNATURES_HEADER_TITLES, head)
+
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(DIGITAL_SIGNATURES_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="DIGITAL SIGNATURES RELAVENT LOD REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        append_main_header(ws, row_idx, "DIGITAL SIGNATURES RELAVENT LOD REPORT", len(DIGITAL_SIGNATURES_HEADERS))
         row_idx += 1
         
         # Display Active Filters
-        if filters:
+        for filter_row in _digital_signature_filter_rows(filters):
+            if filter_row is None:
+                ws.append([])
+            else:
+                append_filter_row(ws, *filter_row)
             row_idx += 1
             
-            # Case_current_starus filter
-            if filters.get('Case_cuurent_status'):
-                ws.cell(row=row_idx, column=2, value="Case_current_status:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['Case_current_status']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(DIGITAL_SIGNATURES_HEADERS), 1:
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        append_header_row(ws, _DIGITAL_SIGNATURES_HEADER_TITLES)
         
-        # Data Rows
-        for record in data:
+        # Data Rows; the row style is resolved once, not per cell
+        border_cell = styled_cell_factory(ws, 'Border_Style')
+        append = ws.append
+        row_count = 0
+        for values in chain(head, map(_digital_signature_row_values, records)):
             row_idx += 1
-            for col_idx, header in enumerate(DIGITAL_SIGNATURES_HEADERS), 1:
-                value = record.get(header, "")
-                if header == "Incident_Id" and isinstance(value, ObjectId):
-                    value = str(value)
-                if header == "Created_Dtm" and isinstance(value, datetime):
-                    value = value.strftime('%Y-%m-%d %H:%M:%S')
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = STYLES['Border_Style']['font']
-                cell.border = STYLES['Border_Style']['border']
-                cell.alignment = STYLES['Border_Style']['alignment']
+            row_count += 1
+            append([border_cell(value) for value in values])
         
         # Add AutoFilter to all columns
-        if data:
-            last_col_letter = get_column_letter(len(DIGITAL_SIGNATURES_HEADERS))
-            ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{row_idx}"
+        if row_count:
+            ws.auto_filter.ref = f"A{header_row}:{_DIGITAL_SIGNATURES_LAST_COLUMN}{row_idx}"
         
-        # Auto-adjust columns
-        for col_idx in range(1, len(DIGITAL_SIGNATURES_HEADERS)) + 1:
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = adjusted_width
-        
-        return True
+        return row_count
     
     except Exception as e:
         logger.error(f"Error creating digital signature sheet: {str(e)}", exc_info=True)
-        return False    
\ No newline at end of file
+        return None
+
+
+def write_digital_signature_fast_table(filepath, data, filters=None):
+    """Write the digital signature report straight to sheet XML for exports above FAST_WRITER_THRESHOLD rows,
+    with the same layout and styles as create_digital_signature_table"""
+    try:
+        rows = map(_digital_signature_row_values, data)
+        head = list(islice(rows, WIDTH_SAMPLE_ROWS))
+        return write_table_xlsx(
+            filepath, "DIGITAL SIGNATURES RELAVENT LOD REPORT", "DIGITAL SIGNATURES RELAVENT LOD REPORT",
+            _DIGITAL_SIGNATURES_HEADER_TITLES, chain(head, rows), filter_rows=_digital_signature_filter_rows(filters),
+            widths=column_widths(_DIGITAL_SIGNATURES_HEADER_TITLES, head), autofilter_rows=True
+        )
+
+    except Exception as e:
+        logger.error(f"Error writing digital signature sheet: {str(e)}", exc_info=True)
+        return None
@@ -80,16 +80,19 @@ Technical Specifications:
         - Incident (primary data source)
         - Filters specifically for "Incident_Status": "Incident Reject"
     - Special Data Handling:
-        - Converts ObjectId to string for Incident_Id
-        - Formats datetime objects for Created_Dtm and Rejected_Dtm
+        - Converts ObjectId to string for Incident_Id (in the aggregation, $toString)
+        - Formats datetime objects for Created_Dtm (in the aggregation, $dateToString)
 '''
 
-from datetime import datetime, timedelta
-from bson import ObjectId
+from functools import partial
+from operator import itemgetter
+from itertools import chain, islice
 from openpyxl import Workbook
-from openpyxl.styles import Font
-from openpyxl.utils import get_column_letter
-from utils.style_loader import STYLES
+from utils.style_loader import register_named_styles
+from utils.download_log import record_download
+from utils.excel_helpers import COLUMN_LETTERS, WIDTH_SAMPLE_ROWS, append_filter_row, append_header_row, append_main_header, column_widths, filename_timestamp, fit_column_widths, styled_cell_factory, unique_now
+from utils.fast_xlsx import EXPORT_SEGMENT_ROWS, FAST_WRITER_THRESHOLD, write_segmented_xlsx, write_table_xlsx
+from utils.cursor_prefetch import prefetched
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -100,84 +103,175 @@ Each_LOD_OR_FINAL_REMINDER_HEADERS = [
     "Incident_Id", "Incident_Status", "Account_Num", "Created_Dtm",
     "Filtered_Reason", "Rejected_Dtm","Rejected_By"
 ]
+_EACH_LOD_OR_FINAL_REMINDER_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in Each_LOD_OR_FINAL_REMINDER_HEADERS)
+_EACH_LOD_OR_FINAL_REMINDER_LAST_COLUMN = COLUMN_LETTERS[len(Each_LOD_OR_FINAL_REMINDER_HEADERS) - 1]
 
-def excel_lod_or_final_reminder_detail(case_current_status, current_document_type):
+# Final pipeline stage: only the exported fields of each case. The id is rendered as text and dates as
+# 'YYYY-MM-DD HH:MM:SS' text on the server (UTC, as the driver decodes them), so no ObjectId or datetime objects are built
+_EACH_LOD_OR_FINAL_REMINDER_PROJECT_STAGE = {"$project": {
+    **{header: 1 for header in Each_LOD_OR_FINAL_REMINDER_HEADERS},
+    "_id": 0,
+    "Incident_Id": {"$cond": [
+        {"$eq": [{"$type": "$Incident_Id"}, "objectId"]},
+        {"$toString": "$Incident_Id"},
+        "$Incident_Id"
+    ]},
+    "Created_Dtm": {"$cond": [
+        {"$eq": [{"$type": "$Created_Dtm"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d %H:%M:%S", "date": "$Created_Dtm"}},
+        "$Created_Dtm"
+    ]},
+}}
+
+# Equality on Actions first, then current_document_type
+EACH_LOD_OR_FINAL_REMINDER_EXPORT_INDEX = "each_lod_or_final_reminder_export_idx"
+_EACH_LOD_OR_FINAL_REMINDER_EXPORT_INDEX_KEYS = [("Actions", 1), ("current_document_type", 1)]
+
+# All exported fields in one C-level call; raises KeyError when a document lacks one of them
+_EACH_LOD_OR_FINAL_REMINDER_FIELDS = itemgetter(*Each_LOD_OR_FINAL_REMINDER_HEADERS)
+
+def _each_lod_or_final_reminder_row_values(record, _fields=_EACH_LOD_OR_FINAL_REMINDER_FIELDS, _headers=tuple(Each_LOD_OR_FINAL_REMINDER_HEADERS)):
+    """Pull the exported fields of one case in header order; the Incident_Id and Created_Dtm columns arrive already converted from the pipeline"""
+    try:
+        return _fields(record)
+    except KeyError:
+        # Missing fields are written as ""
+        get = record.get
+        return [get(header, "") for header in _headers]
+
+# (label, filters key) per filter row in display order, labelled like the proceed LOD report's filters
+_EACH_LOD_OR_FINAL_REMINDER_FILTER_LABELS = (
+    ("Case Current Status:", "case_current_status"),
+    ("Current Document Type:", "current_document_type"),
+)
+
+def _each_lod_or_final_reminder_filter_rows(filters):
+    """Rows between the title and the header: the active filters as (label, value) pairs framed by blank rows"""
+    if not filters:
+        return []
+    filter_rows = [None]
+    for label, key in _EACH_LOD_OR_FINAL_REMINDER_FILTER_LABELS:
+        value = filters.get(key)
+        if value:
+            filter_rows.append((label, value))
+    filter_rows.append(None)
+    return filter_rows
+
+
+def excel_lod_or_final_reminder_detail(case_current_status, current_document_type, segment_size=EXPORT_SEGMENT_ROWS):
     """Fetch and export LOD or final reminder details from Incident collection"""
 
     try:
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            config = ConfigLoaderSingleton()
+            export_dir = config.get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            case_details_collection = db["Case_details"]
+            mongo = MongoDBConnectionSingleton()
+            case_details_collection = mongo.get_collection("Case_details")
+            if case_details_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
+            index_ready = mongo.ensure_index("Case_details", _EACH_LOD_OR_FINAL_REMINDER_EXPORT_INDEX_KEYS, EACH_LOD_OR_FINAL_REMINDER_EXPORT_INDEX, background=True)
             each_query = {}  
 
             # Validate and apply actions filter
             if case_current_status is not None:
-                if case_current_status == "collect CPE":
-                    each_query["Actions"] = {"$regex": f"^{case_current_status}$"}
-                elif case_current_status == "collect arrears":
-                    each_query["Actions"] = case_current_status
-                elif case_current_status == "collect arrears and CPE":
+                if case_current_status in ("collect arrears and CPE", "collect arrears", "collect CPE"):
                     each_query["Actions"] = case_current_status
                 else:
                      raise ValueError(f"Invalid actions '{case_current_status}'. Must be 'collect arrears and CPE', 'collect arrears', or 'collect CPE'")
 
             # Validate and apply current_document_type filter
             if current_document_type is not None:
-                if current_document_type == "PEO TV":
-                  each_query["current_document_type"] = {"$regex": f"^{current_document_type}$"}
-                elif current_document_type == "BB":
-                  each_query["current_document_type"] = current_document_type
+                if current_document_type in ("PEO TV", "BB"):
+                    each_query["current_document_type"] = current_document_type
                 else:
                      raise ValueError(f"Invalid documents '{current_document_type}'. Must be 'PEO TV', 'BB'")
 
             
 
-            logger.info(f"Executing query on Incident for rejected cases: {each_query}")
-            cases = list(case_details_collection.find(each_query))
-            logger.info(f"Found {len(cases)} matching rejected cases")
+            # $match first so the index serves it, then convert and trim each case on the server
+            pipeline = [{"$match": each_query}, _EACH_LOD_OR_FINAL_REMINDER_PROJECT_STAGE]
+            # The export is unbounded, so let the server spill to disk rather than fail on its memory limit
+            aggregate_options = {"batchSize": config.get_query_batch_size(), "allowDiskUse": True}
+            if index_ready and "Actions" in each_query:
+                # Only hint when the index prefix is filtered; otherwise the hint would force a full index scan
+                aggregate_options["hint"] = EACH_LOD_OR_FINAL_REMINDER_EXPORT_INDEX
+                if config.get_explain_queries():
+                    # Development check that the leading $match is still served by the index
+                    mongo.log_query_plan("Case_details", pipeline, hint=EACH_LOD_OR_FINAL_REMINDER_EXPORT_INDEX)
+
+            logger.info(f"Executing pipeline on Case_details for LOD or final reminder cases: {pipeline}")
+            cases = case_details_collection.aggregate(pipeline, **aggregate_options)  # Streamed into the sheet
 
             # Export to Excel
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S%f")
+            # One clock read for the filename and the Download records; unique_now() never repeats a stamp, so
+            # exports started in the same microsecond still get distinct files
+            now_dt = unique_now()
+            timestamp = filename_timestamp(now_dt)
             filename = f"each_lod_or_final_reminder_{timestamp}.xlsx"
             filepath = export_dir / filename
 
-            wb = Workbook()
-            wb.remove(wb.active)
-
-            if not create_rejected_table(wb, cases, {
+            filters = {
                 "case_current_status": case_current_status,
                 "current_document_type": current_document_type
-            }):
-                raise Exception("Failed to create rejected incident sheet")
+            }
+
+            # Look ahead just past the threshold to choose the writer without counting the cursor; the cursor
+            # is read on a background thread from here on, so its round trips overlap with writing the sheet
+            records = prefetched(cases)
+            head = list(islice(records, FAST_WRITER_THRESHOLD + 1))
+            if len(head) > FAST_WRITER_THRESHOLD:
+                # Results above segment_size rows are split across several files
+                parts = write_segmented_xlsx(filepath, chain(head, records), partial(write_each_lod_or_final_reminder_fast_table, filters=filters), segment_size)
+                if parts is None:
+                    raise Exception("Failed to write each LOD or final reminder sheet")
+                exported_count = sum(part_count for _, part_count in parts)
+            else:
+                wb = Workbook(write_only=True)
+                register_named_styles(wb)
+
+                exported_count = create_each_lod_or_final_reminder_table(wb, head, filters)
+                if exported_count is None:
+                    raise Exception("Failed to create each LOD or final reminder sheet")
 
-            wb.save(filepath)
+                wb.save(filepath)
+                parts = [(filepath, exported_count)]
+            logger.info(f"Found {exported_count} matching LOD or final reminder cases")
 
-             # Write export record to Download collection
-            try:
-                download_collection = db["download"]
+            applied_filters = {
+                "Case_Current_Status": case_current_status,
+                "Current_Document_Type": current_document_type
+            }
+            if len(parts) > 1:
+                # One Download record per part file
+                first_row = 1
+                for part_number, (part_path, part_count) in enumerate(parts, 1):
+                    record_download({
+                        "File_Name": part_path.name,
+                        "File_Path": str(part_path),
+                        "Export_Timestamp": now_dt,
+                        "Exported_Record_Count": part_count,
+                        "Part_Number": part_number,
+                        "Record_Range": f"{first_row}-{first_row + part_count - 1}",
+                        "Applied_Filters": applied_filters
+                    })
+                    first_row += part_count
+            else:
                 export_record = {
                     "File_Name": filename,
                     "File_Path": str(filepath),
-                    "Export_Timestamp": datetime.now(),
-                    "Exported_Record_Count": len(cases),
-                    "Applied_Filters": {
-                        "Case_Current_Status": case_current_status,
-                        "Current_Document_Type": current_document_type
-                    }
+                    "Export_Timestamp": now_dt,
+                    "Exported_Record_Count": exported_count,
+                    "Applied_Filters": applied_filters
                 }
-                download_collection.insert_one(export_record)
-                logger.info("Export details written to Download collection.")
-            except Exception as e:
-                logger.error(f"Failed to insert download record: {str(e)}", exc_info=True)
+                # Queue export record for the Download collection; written by the background log worker
+                record_download(export_record)
 
 
-            if not cases:
-                print("No rejected cases found matching the selected filters. Exported empty table to: {filepath}")
-            else:    
-                print(f"\nSuccessfully exported {len(cases)} rejected records to: {filepath}")
+            if not exported_count:
+                print(f"No LOD or final reminder cases found matching the selected filters. Exported empty table to: {filepath}")
+            else:
+                print(f"\nSuccessfully exported {exported_count} LOD or final reminder records to: {', '.join(str(part_path) for part_path, _ in parts)}")
             return True            
            
     except ValueError as ve:
@@ -195,95 +289,63 @@ def create_each_lod_or_final_reminder_table(wb, data, filters=None):
     """Create formatted Excel sheet with each LOD or final reminder data"""
     try:
         ws = wb.create_sheet(title="EACH LOD OR FINAL REMINDER REPORT")
+
+        # Column widths are written ahead of the rows in write-only mode, so size them
+        # from the headers and a buffered head of the data in one pass
+        records = iter(data)
+        head = [_each_lod_or_final_reminder_row_values(record) for record in islice(records, WIDTH_SAMPLE_ROWS)]
+        fit_column_widths(ws, _EACH_LOD_OR_FINAL_REMINDER_HEADER_TITLES, head)
+
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(REJECTED_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="EACH LOD OR FINAL REMINDER REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        append_main_header(ws, row_idx, "EACH LOD OR FINAL REMINDER REPORT", len(Each_LOD_OR_FINAL_REMINDER_HEADERS))
         row_idx += 1
         
         # Display Active Filters
-        if filters:
-            row_idx += 1
-            
-            # Actions filter
-            if filters.get('actions'):
-                ws.cell(row=row_idx, column=2, value="Actions:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['actions']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            # DRC Commission Rule filter
-            if filters.get('drc_commision_rule'):
-                ws.cell(row=row_idx, column=2, value="DRC Commission Rule:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['drc_commision_rule']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            # Date Range filter
-            if filters.get('date_range') and any(filters['date_range']):
-                start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
+        for filter_row in _each_lod_or_final_reminder_filter_rows(filters):
+            if filter_row is None:
+                ws.append([])
+            else:
+                append_filter_row(ws, *filter_row)
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(REJECTED_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        append_header_row(ws, _EACH_LOD_OR_FINAL_REMINDER_HEADER_TITLES)
         
-        # Data Rows
-        for record in data:
+        # Data Rows; the row style is resolved once, not per cell
+        border_cell = styled_cell_factory(ws, 'Border_Style')
+        append = ws.append
+        row_count = 0
+        for values in chain(head, map(_each_lod_or_final_reminder_row_values, records)):
             row_idx += 1
-            for col_idx, header in enumerate(REJECTED_HEADERS, 1):
-                value = record.get(header, "")
-                if header == "Incident_Id" and isinstance(value, ObjectId):
-                    value = str(value)
-                if header == "Created_Dtm" and isinstance(value, datetime):
-                    value = value.strftime('%Y-%m-%d %H:%M:%S')
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.font = STYLES['Border_Style']['font']
-                cell.border = STYLES['Border_Style']['border']
-                cell.alignment = STYLES['Border_Style']['alignment']
+            row_count += 1
+            append([border_cell(value) for value in values])
         
         # Add AutoFilter to all columns
-        if data:
-            last_col_letter = get_column_letter(len(REJECTED_HEADERS))
-            ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{row_idx}"
+        if row_count:
+            ws.auto_filter.ref = f"A{header_row}:{_EACH_LOD_OR_FINAL_REMINDER_LAST_COLUMN}{row_idx}"
         
-        # Auto-adjust columns
-        for col_idx in range(1, len(REJECTED_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = adjusted_width
-        
-        return True
+        return row_count
     
     except Exception as e:
-        logger.error(f"Error creating rejected sheet: {str(e)}", exc_info=True)
-        return False    
\ No newline at end of file
+        logger.error(f"Error creating each LOD or final reminder sheet: {str(e)}", exc_info=True)
+        return None
+
+
+def write_each_lod_or_final_reminder_fast_table(filepath, data, filters=None):
+    """Write the each LOD or final reminder report straight to sheet XML for exports above FAST_WRITER_THRESHOLD rows,
+    with the same layout and styles as create_each_lod_or_final_reminder_table"""
+    try:
+        rows = map(_each_lod_or_final_reminder_row_values, data)
+        head = list(islice(rows, WIDTH_SAMPLE_ROWS))
+        return write_table_xlsx(
+            filepath, "EACH LOD OR FINAL REMINDER REPORT", "EACH LOD OR FINAL REMINDER REPORT",
+            _EACH_LOD_OR_FINAL_REMINDER_HEADER_TITLES, chain(head, rows), filter_rows=_each_lod_or_final_reminder_filter_rows(filters),
+            widths=column_widths(_EACH_LOD_OR_FINAL_REMINDER_HEADER_TITLES, head), autofilter_rows=True
+        )
+
+    except Exception as e:
+        logger.error(f"Error writing each LOD or final reminder sheet: {str(e)}", exc_info=True)
+        return None
@@ -19,7 +19,7 @@ Related Files:
 Program Description:
 1. Core Functionality:
     - excel_rejected_detail(): Main export function that:
-        a. Validates input parameters (actions, DRC commission rule, date range)
+        a. Validates input parameters (case current status, current document type)
         b. Constructs MongoDB query for rejected incidents
         c. Executes query against Incident collection
         d. Generates formatted Excel report
@@ -38,10 +38,8 @@ Program Description:
 
 3. Key Features:
     - Parameter Validation:
-        - Valid actions: "collect arrears and CPE", "collect arrears", "collect CPE"
-        - Valid DRC commission rules: "PEO TV" or "BB"
-        - Date format enforcement (YYYY-MM-DD)
-        - Date range validation (to_date cannot be earlier than from_date)
+        - Valid case current statuses: "collect arrears and CPE", "collect arrears", "collect CPE"
+        - Valid current document types: "PEO TV" or "BB"
     - Error Handling:
         - Comprehensive validation errors
         - Database operation failures
@@ -70,9 +68,9 @@ Program Description:
 
 Technical Specifications:
     - Input Parameters:
-        - actions: String (predefined values)
-        - drc_commision_rule: String ("PEO TV" or "BB")
-        - from_date/to_date: String (YYYY-MM-DD format)
+        - case_current_status: String (predefined values)
+        - current_document_type: String ("PEO TV" or "BB")
+        - case_count: accepted from the task, not used as a filter
     - Output:
         - Excel file with standardized naming convention
         - Returns boolean success status
@@ -85,11 +83,11 @@ Technical Specifications:
 '''
 
 from datetime import datetime, timedelta
-from bson import ObjectId
 from openpyxl import Workbook
 from openpyxl.styles import Font
 from openpyxl.utils import get_column_letter
 from utils.style_loader import STYLES
+from utils.excel_helpers import format_datetime, format_object_id, set_column_widths, write_filter_row, write_header_row, write_main_header
 from utils.connectionMongo import MongoDBConnectionSingleton
 from logging import getLogger
 from utils.config_loader import ConfigLoaderSingleton
@@ -100,6 +98,19 @@ REJECTED_HEADERS = [
     "Incident_Id", "Incident_Status", "Account_Num", "Created_Dtm",
     "Filtered_Reason", "Rejected_Dtm","Rejected_By"
 ]
+_REJECTED_HEADER_TITLES = tuple(header.replace('_', ' ').title() for header in REJECTED_HEADERS)
+
+_REJECTED_FORMATTERS = {
+    "Incident_Id": format_object_id,
+    "Created_Dtm": format_datetime,
+}
+
+# (column index, field, converter or None) per column, built once instead of an enumerate() and
+# two header comparisons per row
+_REJECTED_COLUMNS = tuple(
+    (col_idx, header, _REJECTED_FORMATTERS.get(header))
+    for col_idx, header in enumerate(REJECTED_HEADERS, 1)
+)
 
 def excel_proceed_lod_or_final_reminder_detail(case_current_status, current_document_type, case_count):
     """Fetch and export rejected incidents from Incident collection"""
@@ -107,32 +118,27 @@ def excel_proceed_lod_or_final_reminder_detail(case_current_status, current_docu
         
     try:
             # Get export directory from config
-            export_dir = ConfigLoaderSingleton().get_export_path()
-            export_dir.mkdir(parents=True, exist_ok=True)
+            export_dir = ConfigLoaderSingleton().get_export_dir()
 
-            db = MongoDBConnectionSingleton().get_database()
-            incident_collection = db["Incident"]
+            mongo = MongoDBConnectionSingleton()
+            incident_collection = mongo.get_collection("Incident")
+            if incident_collection is None:
+                raise ConnectionError("MongoDB connection is not available")
             reject_query = {"Incident_Status": "Incident Reject"}  # Fixed to only rejected incidents
 
-            # Validate and apply actions filter
+            # Validate and apply case_current_status filter
             if case_current_status is not None:
-                if case_current_status == "collect CPE":
-                    reject_query["Actions"] = {"$regex": f"^{case_current_status}$"}
-                elif case_current_status == "collect arrears":
+                if case_current_status in ("collect CPE", "collect arrears", "collect arrears and CPE"):
                     reject_query["Actions"] = case_current_status
-                elif case_current_status == "collect arrears and CPE":
-                    reject_query["Actions"] = actions
                 else:
-                     raise ValueError(f"Invalid actions '{actions}'. Must be 'collect arrears and CPE', 'collect arrears', or 'collect CPE'")
+                     raise ValueError(f"Invalid actions '{case_current_status}'. Must be 'collect arrears and CPE', 'collect arrears', or 'collect CPE'")
 
             # Validate and apply current_document_type filter
             if current_document_type is not None:
-                if current_document_type == "PEO TV":
-                  reject_query["current_document_type"] = {"$regex": f"^{current_document_type}$"}
-                elif current_document_type == "BB":
-                  reject_query["current_document_type"] = current_document_type
+                if current_document_type in ("PEO TV", "BB"):
+                    reject_query["current_document_type"] = current_document_type
                 else:
-                     raise ValueError(f"Invalid actions '{actions}'. Must be 'PEO TV', 'BB'")
+                     raise ValueError(f"Invalid documents '{current_document_type}'. Must be 'PEO TV', 'BB'")
 
            
 
@@ -150,10 +156,8 @@ def excel_proceed_lod_or_final_reminder_detail(case_current_status, current_docu
             wb.remove(wb.active)
 
             if not create_rejected_table(wb, incidents, {
-                "actions": actions,
-                "drc_commision_rule": drc_commision_rule,
-                "date_range": (datetime.strptime(from_date, '%Y-%m-%d') if from_date else None,
-                            datetime.strptime(to_date, '%Y-%m-%d') if to_date else None)
+                "case_current_status": case_current_status,
+                "current_document_type": current_document_type
             }):
                 raise Exception("Failed to create rejected incident sheet")
 
@@ -161,17 +165,15 @@ def excel_proceed_lod_or_final_reminder_detail(case_current_status, current_docu
 
              # Write export record to Download collection
             try:
-                download_collection = db["file_download_log"]
+                download_collection = mongo.get_collection("file_download_log")
                 export_record = {
                     "File_Name": filename,
                     "File_Path": str(filepath),
                     "Export_Timestamp": datetime.now(),
                     "Exported_Record_Count": len(incidents),
                     "Applied_Filters": {
-                        "Actions": actions,
-                        "DRC_Commision_Rule": drc_commision_rule,
-                        "From_Date": from_date,
-                        "To_Date": to_date
+                        "Case_Current_Status": case_current_status,
+                        "Current_Document_Type": current_document_type
                     }
                 }
                 download_collection.insert_one(export_record)
@@ -181,7 +183,7 @@ def excel_proceed_lod_or_final_reminder_detail(case_current_status, current_docu
 
 
             if not incidents:
-                print("No rejected incidents found matching the selected filters. Exported empty table to: {filepath}")
+                print(f"No rejected incidents found matching the selected filters. Exported empty table to: {filepath}")
             else:    
                 print(f"\nSuccessfully exported {len(incidents)} rejected records to: {filepath}")
             return True            
@@ -204,70 +206,48 @@ def create_rejected_table(wb, data, filters=None):
         row_idx = 1
         
         # Main Header
-        ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=len(REJECTED_HEADERS))
-        main_header = ws.cell(row=row_idx, column=1, value="REJECTED INCIDENT REPORT")
-        main_header.font = STYLES['MainHeader_Style']['font']
-        main_header.fill = STYLES['MainHeader_Style']['fill']
-        main_header.alignment = STYLES['MainHeader_Style']['alignment']
+        write_main_header(ws, row_idx, "REJECTED INCIDENT REPORT", len(REJECTED_HEADERS))
         row_idx += 1
         
         # Display Active Filters
         if filters:
             row_idx += 1
             
-            # Actions filter
-            if filters.get('actions'):
-                ws.cell(row=row_idx, column=2, value="Actions:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['actions']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+            # Case Current Status filter
+            if filters.get('case_current_status'):
+                write_filter_row(ws, row_idx, "Case Current Status:", filters['case_current_status'])
                 row_idx += 1
             
-            # DRC Commission Rule filter
-            if filters.get('drc_commision_rule'):
-                ws.cell(row=row_idx, column=2, value="DRC Commission Rule:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                ws.cell(row=row_idx, column=3, value=filters['drc_commision_rule']).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
-                row_idx += 1
-            
-            # Date Range filter
-            if filters.get('date_range') and any(filters['date_range']):
-                start, end = filters['date_range']
-                ws.cell(row=row_idx, column=2, value="Date Range:").font = STYLES['FilterParam_Style']['font']
-                ws.cell(row=row_idx, column=2).fill = STYLES['FilterParam_Style']['fill']
-                ws.cell(row=row_idx, column=2).alignment = STYLES['FilterParam_Style']['alignment']
-                date_str = f"{start.strftime('%Y-%m-%d') if start else 'Beginning'} to {end.strftime('%Y-%m-%d') if end else 'Now'}"
-                ws.cell(row=row_idx, column=3, value=date_str).font = STYLES['FilterValue_Style']['font']
-                ws.cell(row=row_idx, column=3).fill = STYLES['FilterValue_Style']['fill']
-                ws.cell(row=row_idx, column=3).alignment = STYLES['FilterValue_Style']['alignment']
+            # Current Document Type filter
+            if filters.get('current_document_type'):
+                write_filter_row(ws, row_idx, "Current Document Type:", filters['current_document_type'])
                 row_idx += 1
             
             row_idx += 1
         
         # Data Table Headers
         header_row = row_idx
-        for col_idx, header in enumerate(REJECTED_HEADERS, 1):
-            cell = ws.cell(row=row_idx, column=col_idx, value=header.replace('_', ' ').title())
-            cell.font = STYLES['SubHeader_Style']['font']
-            cell.fill = STYLES['SubHeader_Style']['fill']
-            cell.border = STYLES['SubHeader_Style']['border']
-            cell.alignment = STYLES['SubHeader_Style']['alignment']
-            ws.column_dimensions[get_column_letter(col_idx)].width = 20
+        write_header_row(ws, row_idx, _REJECTED_HEADER_TITLES)
+        
+        # Column widths are tracked while the rows are written instead of re-reading every cell afterwards;
+        # the filter block (columns B and C) counts too, the merged title does not
+        col_max = [len(title) for title in _REJECTED_HEADER_TITLES]
+        for row in ws.iter_rows(min_row=2, max_row=header_row - 1, min_col=2, max_col=3, values_only=True):
+            for col_idx, value in enumerate(row, 1):
+                length = len(str(value)) if value else 0
+                if length > col_max[col_idx]:
+                    col_max[col_idx] = length
         
         # Data Rows
         for record in data:
             row_idx += 1
-            for col_idx, header in enumerate(REJECTED_HEADERS, 1):
+            for col_idx, header, fmt in _REJECTED_COLUMNS:
                 value = record.get(header, "")
-                if header == "Incident_Id" and isinstance(value, ObjectId):
-                    value = str(value)
-                if header == "Created_Dtm" and isinstance(value, datetime):
-                    value = value.strftime('%Y-%m-%d %H:%M:%S')
+                if fmt is not None:
+                    value = fmt(value)
+                length = len(str(value)) if value else 0
+                if length > col_max[col_idx - 1]:
+                    col_max[col_idx - 1] = length
                 cell = ws.cell(row=row_idx, column=col_idx, value=value)
                 cell.font = STYLES['Border_Style']['font']
                 cell.border = STYLES['Border_Style']['border']
@@ -279,14 +259,7 @@ def create_rejected_table(wb, data, filters=None):
             ws.auto_filter.ref = f"{get_column_letter(1)}{header_row}:{last_col_letter}{row_idx}"
         
         # Auto-adjust columns
-        for col_idx in range(1, len(REJECTED_HEADERS) + 1):
-            col_letter = get_column_letter(col_idx)
-            max_length = max(
-                len(str(cell.value)) if cell.value else 0
-                for cell in ws[col_letter]
-            )
-            adjusted_width = (max_length + 2) * 1.2
-            ws.column_dimensions[col_letter].width = adjusted_width
+        set_column_widths(ws, [(length + 2) * 1.2 for length in col_max])
         
         return True
     
@@ -29,6 +29,7 @@ Program Description:
         - Extracts task parameters
         - Finds corresponding handler method (handle_task_{template_id})
         - Executes the handler with task parameters
+        - Exports are IO-bound (MongoDB fetch, workbook write), so tasks run concurrently on a thread pool
     
 3. Error Handling:
     - Validates presence of template task IDs
@@ -39,6 +40,7 @@ Program Description:
     - Tasks are read from System_tasks collection
     - Handlers process tasks according to their Template_Task_Id
     - Execution results are logged via appLogger
+    - Download records queued by the exporters are written in the background and flushed before the connection closes
 
 MongoDB Collections:
     - System_tasks (primary collection for task management)
@@ -50,13 +52,27 @@ Task Types Supported:
 '''
 
 # task_manager.py
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from utils.config_loader import ConfigLoaderSingleton
 from tasks.task_handler import TaskHandlers
 import logging
-from utils.connectionMongo import MongoDBConnectionSingleton
+from utils.connectionMongo import MAX_POOL_SIZE, MongoDBConnectionSingleton
+from utils.download_log import flush_download_log
 
 logger = logging.getLogger('appLogger')
 
+# Equality on task_status first, then the Template_Task_Id $in
+SYSTEM_TASKS_OPEN_INDEX = "system_tasks_open_idx"
+_SYSTEM_TASKS_OPEN_INDEX_KEYS = [("task_status", 1), ("Template_Task_Id", 1)]
+
+# Only the fields needed to dispatch a task (_id is kept for error reporting)
+_SYSTEM_TASK_PROJECTION = {"Template_Task_Id": 1, "parameters": 1}
+
+# Exports share the singleton MongoClient (thread-safe, pooled) and each builds its own workbook.
+# Capped below the pool size so the dispatch cursor and the download-log writer never wait for a connection
+EXPORT_WORKERS = max(1, min(os.cpu_count() or 1, MAX_POOL_SIZE - 2))
+
 class TaskManager:
     def __init__(self):
         self.template_ids = ConfigLoaderSingleton().get_template_task_ids()
@@ -69,27 +85,44 @@ class TaskManager:
         task_handlers = TaskHandlers()
 
         try:
-            with MongoDBConnectionSingleton() as db:
+            mongo = MongoDBConnectionSingleton()
+            with mongo as db:
                 system_tasks_collection = db['System_tasks_Inprogress']
+                index_ready = mongo.ensure_index('System_tasks_Inprogress', _SYSTEM_TASKS_OPEN_INDEX_KEYS, SYSTEM_TASKS_OPEN_INDEX, background=True)
                 
                 # Query for tasks with matching template IDs and open status
                 query = {
-                    "Template_Task_Id": { "$in": self.template_ids },
-                    "task_status": { "$in": ["open"] }
+                    "task_status": "open",
+                    "Template_Task_Id": { "$in": self.template_ids }
                 }
 
-                for task in system_tasks_collection.find(query):
-                    try:
-                        template_id = task.get("Template_Task_Id")
-                        params = task.get("parameters", {})
-                        
-                        # Call the unified handler with template_id and parameters
-                        task_handlers.handle_task(template_id, **params)
-                        logger.info(f"Successfully executed task {template_id}")
-                        
-                    except Exception as task_error:
-                        logger.error(f"Task {task.get('_id')} failed: {task_error}", exc_info=True)
-                        # Optionally update task status to 'failed' here
+                tasks = system_tasks_collection.find(query, _SYSTEM_TASK_PROJECTION)
+                if index_ready:
+                    tasks = tasks.hint(SYSTEM_TASKS_OPEN_INDEX)
+
+                # Submit every task first so one export's MongoDB fetch overlaps another's workbook write
+                with ThreadPoolExecutor(max_workers=EXPORT_WORKERS, thread_name_prefix="export") as executor:
+                    futures = {}
+                    for task in tasks:
+                        try:
+                            template_id = task.get("Template_Task_Id")
+                            params = task.get("parameters", {})
+                            # Call the unified handler with template_id and parameters
+                            futures[executor.submit(task_handlers.handle_task, template_id, **params)] = task
+                        except Exception as task_error:
+                            logger.error(f"Task {task.get('_id')} failed: {task_error}", exc_info=True)
+
+                    for future in as_completed(futures):
+                        task = futures[future]
+                        try:
+                            future.result()
+                            logger.info(f"Successfully executed task {task.get('Template_Task_Id')}")
+                        except Exception as task_error:
+                            logger.error(f"Task {task.get('_id')} failed: {task_error}", exc_info=True)
+                            # Optionally update task status to 'failed' here
+
+                # Write the Download records of this run in one round trip, before the connection closes
+                flush_download_log()
 
         except Exception as db_error:
             logger.error(f"Database operation failed: {db_error}", exc_info=True)
\ No newline at end of file
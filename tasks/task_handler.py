@@ -58,8 +58,6 @@ Future Extensibility:
 
 # task_handler.py
 import logging
-from datetime import datetime
-from utils.connectionMongo import MongoDBConnectionSingleton
 from export._20_incident import excel_incident_detail
 from export._21_incident_open import excel_incident_open_distribution
 from export._22_pending_reject import excel_pending_reject_incident
@@ -72,7 +70,6 @@ from export._28_case_distribution_drc_transaction_batch_list_distribution_array
 from export._30_drc_assign_batch_approval_list import excel_drc_assign_batch_approval
 from export._33_drc_assign_manager_approval_list import excel_drc_approval_detail
 from export._32_case_distribution_drc_summary_drc_id import excel_drc_summary_detail
-from export._37_request_log import excel_request_log_detail
 from export._38_request_response_log_list import excel_case_detail
 from export._39_digital_signatures_relavent_lod import excel_digital_signature_detail
 from export._40_each_lod_or_final_remider_case import excel_lod_or_final_reminder_detail
@@ -152,14 +149,6 @@ class TaskHandlers:
                         params.get('drc_name'), 
                         params.get('case_distribution_batch_id')
                     ) 
-                case 37:
-                    return excel_request_log_detail(
-                        params.get('deligate_user_id'),
-                        params.get('user_interaction_type'),
-                        params.get('drc_id'),
-                        params.get('from_date'),
-                        params.get('to_date'),
-                    )
                 case 38:
                     return excel_case_detail(
                         params.get('case_current_status'),
@@ -20,6 +20,7 @@ class ConfigLoaderSingleton:
         return cls._instance
 
     def _load_config(self):
+        self._export_dir = None
         try:
             project_root = Path(__file__).resolve().parents[1]
             config_path = project_root / 'config' / 'core_config.ini'
@@ -51,6 +52,33 @@ class ConfigLoaderSingleton:
         return [int(key) for key in self.config[section].keys() if key.isdigit()]
 
 
+    def get_query_batch_size(self, default=5000):
+        """Get the MongoDB cursor batch size for export queries, falling back to the default"""
+        if self.config is None:
+            return default
+
+        section = f'export_query_{self.environment}'
+        try:
+            batch_size = self.config.getint(section, 'BATCH_SIZE', fallback=default)
+        except ValueError:
+            logger.error(f"Invalid BATCH_SIZE in section [{section}], using {default}")
+            return default
+        return batch_size if batch_size > 0 else default
+
+
+    def get_explain_queries(self):
+        """Whether exports should log the planner's choice for their indexed queries (off unless configured)"""
+        if self.config is None:
+            return False
+
+        section = f'export_query_{self.environment}'
+        try:
+            return self.config.getboolean(section, 'EXPLAIN_QUERIES', fallback=False)
+        except ValueError:
+            logger.error(f"Invalid EXPLAIN_QUERIES in section [{section}], explain logging disabled")
+            return False
+
+
     def get_export_path(self):
         """Get export path from config based on environment and operating system"""
         if not self.config or not self.environment:
@@ -70,4 +98,13 @@ class ConfigLoaderSingleton:
             else:
                 raise OSError(f"Unsupported operating system: {system}")
         except KeyError as e:
-            raise ValueError(f"Missing export path configuration for {system}") from e
\ No newline at end of file
+            raise ValueError(f"Missing export path configuration for {system}") from e
+
+    def get_export_dir(self):
+        """Get the export path and create it once per process instead of on every export"""
+        export_dir = self._export_dir
+        if export_dir is None:
+            export_dir = self.get_export_path()
+            export_dir.mkdir(parents=True, exist_ok=True)
+            self._export_dir = export_dir
+        return export_dir
\ No newline at end of file
@@ -4,11 +4,34 @@ from pathlib import Path
 from pymongo import MongoClient
 from utils.logger import SingletonLogger
 
+# One client (and pool) is shared by every export thread: keep the pool well above the export worker count,
+# fail fast when the server is unreachable, and compress the large export replies on the wire
+# (zlib ships with Python, unlike the zstd/snappy compressors)
+MAX_POOL_SIZE = 50
+_CLIENT_OPTIONS = {
+    "maxPoolSize": MAX_POOL_SIZE,
+    "minPoolSize": 5,
+    "serverSelectionTimeoutMS": 3000,
+    "compressors": "zlib",
+}
+
+def _collect_winning_stages(node, stages, in_winning_plan=False):
+    """Append the stage names of every winningPlan in an explain document, outermost stage first"""
+    if isinstance(node, dict):
+        if in_winning_plan and "stage" in node:
+            stages.append(node["stage"])
+        for key, value in node.items():
+            if key != "rejectedPlans":
+                _collect_winning_stages(value, stages, in_winning_plan or key == "winningPlan")
+    elif isinstance(node, list):
+        for value in node:
+            _collect_winning_stages(value, stages, in_winning_plan)
 
 class MongoDBConnectionSingleton:
     #get connection
     _instance = None
     _lock = threading.Lock()
+    _ensured_indexes = set()
 
     def __new__(cls):
         if cls._instance is None:
@@ -20,6 +43,7 @@ class MongoDBConnectionSingleton:
 
     def _initialize_connection(self):
       self.logger = SingletonLogger.get_logger('dbLogger')
+      self._collections = {}
       try:
           # Load connection details from config
           project_root = Path(__file__).resolve().parents[1]
@@ -42,7 +66,7 @@ class MongoDBConnectionSingleton:
           if not mongo_uri or not mongo_dbname:
               raise ValueError(f"MongoDB URI or database name missing in [{section}] configuration.")
 
-          self.client = MongoClient(mongo_uri)
+          self.client = MongoClient(mongo_uri, **_CLIENT_OPTIONS)
           self.database = self.client[mongo_dbname]  # Correctly set the Database object
 
           self.logger.info("MongoDB connection established successfully.")
@@ -60,6 +84,51 @@ class MongoDBConnectionSingleton:
     def get_database(self):
         return self.database
 
+    def get_collection(self, collection_name):
+        """Return a Collection handle, built once per connection instead of on every db[...] lookup"""
+        if self.database is None:
+            return None
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            collection = self._collections[collection_name] = self.database[collection_name]
+        return collection
+
+    def ensure_index(self, collection_name, keys, name, **kwargs):
+        """Create an index once per process; returns True when the index is available for hints"""
+        if (collection_name, name) in MongoDBConnectionSingleton._ensured_indexes:
+            return True
+        if self.database is None:
+            return False
+        try:
+            self.get_collection(collection_name).create_index(keys, name=name, **kwargs)
+            MongoDBConnectionSingleton._ensured_indexes.add((collection_name, name))
+            return True
+        except Exception as err:
+            self.logger.error(f"Error creating index {name} on {collection_name}: {err}")
+            return False
+
+    def log_query_plan(self, collection_name, pipeline, hint=None):
+        """Explain an aggregation (queryPlanner only, nothing is executed) and log its winning plan stages;
+        a collection scan is logged as a warning. Returns the stage names, or None if explain failed"""
+        if self.database is None:
+            return None
+        command = {"aggregate": collection_name, "pipeline": pipeline, "cursor": {}}
+        if hint is not None:
+            command["hint"] = hint
+        try:
+            explained = self.database.command("explain", command, verbosity="queryPlanner")
+        except Exception as err:
+            self.logger.error(f"Error explaining pipeline on {collection_name}: {err}")
+            return None
+
+        stages = []
+        _collect_winning_stages(explained, stages)
+        if "COLLSCAN" in stages:
+            self.logger.warning(f"Pipeline on {collection_name} runs as a collection scan: {' > '.join(stages)}")
+        else:
+            self.logger.info(f"Pipeline on {collection_name} plan: {' > '.join(stages)}")
+        return stages
+
     def close_connection(self):
         if self.client:
             try:
@@ -67,6 +136,7 @@ class MongoDBConnectionSingleton:
                 self.logger.info("MongoDB connection closed.")
                 self.client = None
                 self.database = None
+                self._collections.clear()
                 MongoDBConnectionSingleton._instance = None
             except Exception as err:
                 self.logger.error(f"Error closing MongoDB connection: {err}")
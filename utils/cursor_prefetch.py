@@ -0,0 +1,66 @@
+# cursor_prefetch.py (Background read-ahead for MongoDB cursors feeding the sheet writers)
+import threading
+from itertools import islice
+from queue import Empty, Full, Queue
+
+# Documents handed over per queue item, and how many items the reader may run ahead of the writer
+PREFETCH_CHUNK_ROWS = 1000
+PREFETCH_MAX_CHUNKS = 4
+
+# Seconds between checks of the stop flag while the reader waits on a full queue
+_STOP_POLL_SECONDS = 0.5
+
+_END = object()
+
+
+def _put(chunks, item, stop):
+    """Queue an item, giving up once the consumer has stopped; returns whether it was queued"""
+    while not stop.is_set():
+        try:
+            chunks.put(item, timeout=_STOP_POLL_SECONDS)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def _read_ahead(records, chunks, stop, chunk_rows):
+    """Reader thread: move the cursor's documents into the queue in chunks until exhausted or stopped"""
+    try:
+        while True:
+            chunk = list(islice(records, chunk_rows))
+            if not chunk:
+                _put(chunks, _END, stop)
+                return
+            if not _put(chunks, chunk, stop):
+                return
+    except BaseException as e:
+        # Hand cursor errors (network, query) to the consumer, which re-raises them
+        _put(chunks, e, stop)
+
+
+def prefetched(records, chunk_rows=PREFETCH_CHUNK_ROWS, max_chunks=PREFETCH_MAX_CHUNKS):
+    """Iterate `records` with a reader thread running up to `max_chunks` chunks ahead, so the cursor's
+    getMore round trips overlap with building the sheet. The cursor is only touched by the reader thread
+    once iteration starts; errors it raises are re-raised here"""
+    chunks = Queue(maxsize=max_chunks)
+    stop = threading.Event()
+    reader = threading.Thread(target=_read_ahead, args=(iter(records), chunks, stop, chunk_rows),
+                              name="cursor-prefetch", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = chunks.get()
+            if item is _END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield from item
+    finally:
+        # Consumer finished or gave up early: let the reader stop instead of blocking on a full queue
+        stop.set()
+        try:
+            while True:
+                chunks.get_nowait()
+        except Empty:
+            pass
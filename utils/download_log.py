@@ -0,0 +1,75 @@
+# download_log.py (Background writer for export records in the file_download_log collection)
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from logging import getLogger
+from pymongo import WriteConcern
+from utils.connectionMongo import MongoDBConnectionSingleton
+
+logger = getLogger('appLogger')
+
+DOWNLOAD_LOG_COLLECTION = "file_download_log"
+
+_pending_records = []
+_pending_lock = threading.Lock()
+_drain_scheduled = False
+
+# A single worker keeps writes in submission order, so a flush also waits for earlier drains
+_log_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="dl-log")
+
+
+def _write_pending_records():
+    """Write all queued export records in a single unacknowledged insert_many; returns the count sent"""
+    global _drain_scheduled
+    with _pending_lock:
+        records = _pending_records[:]
+        _pending_records.clear()
+        _drain_scheduled = False
+    if not records:
+        return 0
+
+    try:
+        db = MongoDBConnectionSingleton().get_database()
+        if db is None:
+            raise ConnectionError("MongoDB connection is not available")
+
+        # Download records are observability data, so w=0 skips waiting for the server acknowledgement
+        download_collection = db.get_collection(DOWNLOAD_LOG_COLLECTION, write_concern=WriteConcern(w=0))
+        download_collection.insert_many(records, ordered=False)
+        logger.info(f"{len(records)} export record(s) written to Download collection.")
+        return len(records)
+    except Exception as e:
+        logger.error(f"Failed to insert download records: {str(e)}", exc_info=True)
+        return 0
+
+
+def record_download(export_record):
+    """Queue an export record and hand the write to the background worker, off the export's return path"""
+    global _drain_scheduled
+    with _pending_lock:
+        _pending_records.append(export_record)
+        if _drain_scheduled:
+            return
+        _drain_scheduled = True
+    try:
+        _log_executor.submit(_write_pending_records)
+    except RuntimeError:
+        # Interpreter is shutting down; _shutdown_download_log() writes what is left
+        pass
+
+
+def flush_download_log():
+    """Block until every queued export record has been written; returns the count written by this flush"""
+    try:
+        return _log_executor.submit(_write_pending_records).result()
+    except RuntimeError:
+        return _write_pending_records()
+
+
+def _shutdown_download_log():
+    """Let in-flight background writes finish, then write anything still queued"""
+    _log_executor.shutdown(wait=True)
+    _write_pending_records()
+
+
+atexit.register(_shutdown_download_log)
@@ -0,0 +1,152 @@
+# excel_helpers.py (Worksheet helpers shared by the export modules)
+import threading
+import time
+from datetime import datetime
+from bson import ObjectId
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.cell.cell import Cell
+from openpyxl.utils import get_column_letter
+from utils.style_loader import NAMED_STYLE_ATTRS, STYLES
+
+# Column letters A..ZZ, computed once instead of per call in the sizing and range code
+COLUMN_LETTERS = tuple(get_column_letter(col_idx) for col_idx in range(1, 703))
+
+# Leading data rows buffered to size columns before the first append in write-only mode
+WIDTH_SAMPLE_ROWS = 1000
+
+# isoformat() -> '%Y%m%d_%H%M%S%f' without going through strftime's format interpreter
+_FILENAME_TIMESTAMP_TABLE = str.maketrans({'-': None, ':': None, '.': None, 'T': '_'})
+
+# Last microsecond handed out by unique_now(); exports run concurrently, so guarded by a lock
+_last_now_us = 0
+_now_lock = threading.Lock()
+
+
+def _section_style_items(name):
+    """(attribute, style object) pairs configured for a table section, resolved once at import"""
+    section = STYLES.get(name, {})
+    return tuple((attr, section[attr]) for attr in NAMED_STYLE_ATTRS[name] if attr in section)
+
+
+def styled_cell(ws, value, style_name, number_format=None):
+    """Create a WriteOnlyCell using a named style registered via register_named_styles()"""
+    cell = WriteOnlyCell(ws, value=value)
+    cell.style = style_name
+    if number_format is not None:
+        cell.number_format = number_format
+    return cell
+
+
+def styled_cell_factory(ws, style_name, number_format=None):
+    """Return a value -> WriteOnlyCell function for one named style; the style is resolved once on a
+    template cell and its style array copied into each new cell, skipping the per-cell name lookup"""
+    style_array = styled_cell(ws, None, style_name, number_format)._style
+
+    def make_cell(value):
+        return Cell(ws, row=1, column=1, value=value, style_array=style_array)
+    return make_cell
+
+
+def format_object_id(value):
+    """ObjectId cells are written as their hex string; other values pass through"""
+    return str(value) if isinstance(value, ObjectId) else value
+
+
+def format_datetime(value):
+    """datetime cells are written as 'YYYY-MM-DD HH:MM:SS' text; other values pass through"""
+    return value.strftime('%Y-%m-%d %H:%M:%S') if isinstance(value, datetime) else value
+
+
+def set_column_widths(ws, widths):
+    """Set column widths; in write-only mode this must happen before the first append"""
+    for col_idx, width in enumerate(widths):
+        ws.column_dimensions[COLUMN_LETTERS[col_idx]].width = width
+
+
+def unique_now():
+    """Current local time for export filenames; strictly increasing within the process, so two exports
+    started in the same microsecond still get distinct stamps"""
+    global _last_now_us
+    now_us = time.time_ns() // 1000
+    with _now_lock:
+        if now_us <= _last_now_us:
+            now_us = _last_now_us + 1
+        _last_now_us = now_us
+    seconds, microsecond = divmod(now_us, 1_000_000)
+    return datetime.fromtimestamp(seconds).replace(microsecond=microsecond)
+
+
+def filename_timestamp(now_dt):
+    """Render a datetime as the YYYYMMDD_HHMMSSffffff stamp used in export filenames"""
+    return now_dt.isoformat(timespec='microseconds').translate(_FILENAME_TIMESTAMP_TABLE)
+
+
+def _display_length(value):
+    """Rendered length of a cell value; datetimes display as 'yyyy-mm-dd hh:mm:ss'"""
+    if isinstance(value, datetime):
+        return 19
+    return len(str(value)) if value else 0
+
+
+def column_widths(titles, rows):
+    """Compute column widths in a single pass over the header titles and the buffered leading rows"""
+    col_max = [len(title) for title in titles]
+    for values in rows:
+        for col_idx, value in enumerate(values):
+            length = _display_length(value)
+            if length > col_max[col_idx]:
+                col_max[col_idx] = length
+    return [max((length + 2) * 1.2, 20) for length in col_max]
+
+
+def fit_column_widths(ws, titles, rows):
+    """Size worksheet columns from the header titles and the buffered leading rows"""
+    set_column_widths(ws, column_widths(titles, rows))
+
+
+def append_main_header(ws, row_idx, title, column_count):
+    """Append the report title and merge it across the table width"""
+    ws.append([styled_cell(ws, title, 'MainHeader_Style')])
+    ws.merged_cells.add(f"A{row_idx}:{COLUMN_LETTERS[column_count - 1]}{row_idx}")
+
+
+def append_filter_row(ws, label, value):
+    """Append an active-filter row (label in column B, value in column C)"""
+    ws.append([None, styled_cell(ws, label, 'FilterParam_Style'), styled_cell(ws, value, 'FilterValue_Style')])
+
+
+def write_main_header(ws, row_idx, title, column_count,
+                      _style=_section_style_items('MainHeader_Style')):
+    """Write the report title on a standard worksheet and merge it across the table width"""
+    ws.merge_cells(start_row=row_idx, start_column=1, end_row=row_idx, end_column=column_count)
+    cell = ws.cell(row=row_idx, column=1, value=title)
+    for attr, style in _style:
+        setattr(cell, attr, style)
+
+
+def write_filter_row(ws, row_idx, label, value,
+                     _param_style=_section_style_items('FilterParam_Style'),
+                     _value_style=_section_style_items('FilterValue_Style')):
+    """Write an active-filter row (label in column B, value in column C) on a standard worksheet"""
+    cell = ws.cell(row=row_idx, column=2, value=label)
+    for attr, style in _param_style:
+        setattr(cell, attr, style)
+    cell = ws.cell(row=row_idx, column=3, value=value)
+    for attr, style in _value_style:
+        setattr(cell, attr, style)
+
+
+def write_header_row(ws, row_idx, titles, width=None,
+                     _style=_section_style_items('SubHeader_Style')):
+    """Write the data table header row on a standard worksheet, optionally giving every column a starting width"""
+    for col_idx, title in enumerate(titles, 1):
+        cell = ws.cell(row=row_idx, column=col_idx, value=title)
+        for attr, style in _style:
+            setattr(cell, attr, style)
+        if width is not None:
+            ws.column_dimensions[COLUMN_LETTERS[col_idx - 1]].width = width
+
+
+def append_header_row(ws, titles):
+    """Append the data table header row"""
+    ws.append([styled_cell(ws, title, 'SubHeader_Style') for title in titles])
@@ -1,5 +1,5 @@
 from configparser import ConfigParser
-from openpyxl.styles import Font, PatternFill, Border, Side, Alignment
+from openpyxl.styles import Font, PatternFill, Border, Side, Alignment, NamedStyle
 import os
 
 def load_table_styles():
@@ -70,4 +70,20 @@ def load_table_styles():
     
     return styles
 
-STYLES = load_table_styles()
\ No newline at end of file
+STYLES = load_table_styles()
+
+# Style attributes applied by each table section of the exports
+NAMED_STYLE_ATTRS = {
+    'MainHeader_Style': ('font', 'fill', 'alignment'),
+    'FilterParam_Style': ('font', 'fill', 'alignment'),
+    'FilterValue_Style': ('font', 'fill', 'alignment'),
+    'SubHeader_Style': ('font', 'fill', 'border', 'alignment'),
+    'Border_Style': ('font', 'border', 'alignment'),
+}
+
+def register_named_styles(wb):
+    """Register one NamedStyle per table section so cells take a single `cell.style = name` assignment"""
+    # NamedStyle objects bind to a single workbook, so build fresh ones for every export
+    for name, attrs in NAMED_STYLE_ATTRS.items():
+        section = STYLES.get(name, {})
+        wb.add_named_style(NamedStyle(name=name, **{attr: section[attr] for attr in attrs if attr in section}))